@@ -0,0 +1,144 @@
+#!/bin/python3
+import os
+import time
+import logging
+from collections import deque
+if __package__ == "":
+    from _Decompress import Decompress
+    from _Py7z import Py7z
+else:
+    from ._Decompress import Decompress
+    from ._Py7z import Py7z
+
+
+class Archive():
+    '''
+    one front door for Decompress (libarchive), its ZipFile fallback and Py7z. the backend is picked per archive
+    by format and size from policy, the first rule matching with an available backend wins:
+
+        a = Archive("bundle.7z")
+        a.extractAll("out")
+        a.backend  # "7z" for a big 7z when 7z is installed
+
+    force one with Archive(file, backend="libarchive"). every call is recorded in Archive.history
+    '''
+    backends = ("zipfile", "7z", "libarchive")
+    # format, min size, max size (None for no limit), backend. calibrate with benchmarks/bench_archive_backends.py
+    policy = [
+        ("zip", 0, 4*1048576, "zipfile"),
+        ("7z", 64*1048576, None, "7z"),
+        (None, 0, None, "libarchive"),
+        ("zip", 0, None, "zipfile"),
+        (None, 0, None, "7z"),
+    ]
+    history = deque(maxlen=1000)
+    on_record = None  # called with every record, to feed metrics
+
+    @classmethod
+    def setPolicy(cls, policy: list) -> None:
+        for rule in policy:
+            if rule[3] not in cls.backends:
+                raise ValueError("Unsupported backend %s" % rule[3])
+        cls.policy = policy
+
+    @classmethod
+    def is_available(cls, backend: str) -> bool:
+        # libarchive and 7z are cached by Decompress and Py7z, which also know when setLibarchive() or set7zBin() changed them
+        if backend == "libarchive":
+            return Decompress.load_libarchive()
+        elif backend == "7z":
+            try:
+                Py7z.check_bin()
+                return True
+            except FileNotFoundError:
+                return False
+        return True
+
+    @staticmethod
+    def detect_format(filename: str) -> str:
+        '''
+        "zip", "7z" or "other" from the magic bytes, .exe is taken as a 7z sfx
+        '''
+        with open(filename, "rb") as f:
+            magic = f.read(6)
+        if magic.startswith(b"PK\x03\x04") or magic.startswith(b"PK\x05\x06"):
+            return "zip"
+        elif magic == Decompress.sfx_signature or filename.endswith(".exe"):
+            return "7z"
+        return "other"
+
+    @classmethod
+    def choose(cls, format: str, size: int, policy: list = None) -> str:
+        for rule_format, min_size, max_size, backend in policy or cls.policy:
+            if rule_format not in (None, format) or size < min_size or (max_size != None and size > max_size):
+                continue
+            if backend == "zipfile" and format != "zip":
+                continue
+            if cls.is_available(backend):
+                return backend
+        raise RuntimeError("no backend available for %s archive" % format)
+
+    def __init__(self, filename: str, backend: str = None, policy: list = None, threads: int = 0) -> None:
+        '''
+        threads is passed to 7z as -mmt, 0 lets 7z decide
+        '''
+        self.filename = filename
+        self.format = self.detect_format(filename)
+        self.size = os.path.getsize(filename)
+        if backend == None:
+            backend = self.choose(self.format, self.size, policy)
+        elif backend not in self.backends:
+            raise ValueError("Unsupported backend %s" % backend)
+        self.backend = backend
+        self.threads = threads
+        logging.debug("%s backend for %s (%s, %s bytes)" %
+                      (backend, filename, self.format, self.size))
+        if backend == "7z":
+            self.impl = Py7z(filename)
+        else:
+            self.impl = Decompress(filename, use_zipfile=backend == "zipfile")
+
+    def record(self, operation: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            record = {
+                "filename": self.filename,
+                "format": self.format,
+                "size": self.size,
+                "backend": self.backend,
+                "operation": operation,
+                "seconds": time.perf_counter()-start,
+                "ok": ok
+            }
+            self.history.append(record)
+            logging.debug("%s %s with %s in %.3fs" % (
+                operation, self.filename, self.backend, record["seconds"]))
+            # looked up on the class, a function stored there would get self as first argument otherwise
+            on_record = type(self).on_record
+            if on_record:
+                on_record(record)
+
+    def getFileList(self) -> list:
+        return self.record("list", self.impl.getFileList)
+
+    def getPrefixDir(self) -> str:
+        return self.record("list", self.impl.getPrefixDir)
+
+    def extractFiles(self, filenames: list, outdir: str) -> None:
+        self.record("extractFiles", self.impl.extractFiles, filenames, outdir)
+
+    def extractAll(self, outdir: str) -> None:
+        if self.backend == "7z":
+            switches = ["-mmt=%s" % (self.threads or "on")]
+            self.record("extractAll", self.impl.extractAll, outdir, switches)
+        else:
+            self.record("extractAll", self.impl.extractAll, outdir)
+
+
+if __name__ == "__main__":
+    pass
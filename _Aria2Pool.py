@@ -0,0 +1,125 @@
+#!/bin/python3
+import logging
+import time
+import threading
+import xmlrpc.client
+from http.client import HTTPException
+if __package__ == "":
+    from _Aria2Rpc import Aria2Rpc, Aria2Task
+else:
+    from ._Aria2Rpc import Aria2Rpc, Aria2Task
+
+
+class Aria2Pool():
+    '''
+    spreads downloads across several aria2 instances. attach to running ones with instances, a list of Aria2Rpc kwargs:
+
+        pool = Aria2Pool([{"port": 6800, "passwd": "abc"}, {"host": "10.0.0.2", "passwd": "abc"}])
+
+    or launch size local aria2c on ports from base_port, kwargs are passed to every Aria2Rpc:
+
+        pool = Aria2Pool(size=4, base_port=6800, dir="/mnt/temp")
+
+    strategy "active" picks the instance with the fewest active and waiting downloads, "bandwidth" the one with the lowest download speed
+    '''
+    strategies = ("active", "bandwidth")
+    # an instance raising one of these is skipped, like a daemon that failed to start or answers with an http error
+    unavailable_errors = (OSError, HTTPException,
+                          xmlrpc.client.ProtocolError, RuntimeError)
+
+    def __init__(self, instances: list = None, size: int = 0, base_port: int = 6800, strategy: str = "active", stat_ttl: float = 1, **kwargs) -> None:
+        if strategy not in self.strategies:
+            raise ValueError("Unsupported strategy %s" % strategy)
+        self.strategy = strategy
+        self.stat_ttl = stat_ttl
+        self.instances = []
+        if instances:
+            for opts in instances:
+                self.instances.append(Aria2Rpc(**opts))
+        for i in range(size):
+            # start them all at once, each instance waits for its own daemon on first call
+            opts = {"host": "127.0.0.1", "port": base_port+i, "start_async": True}
+            opts.update(kwargs)
+            self.instances.append(Aria2Rpc(**opts))
+        if len(self.instances) == 0:
+            raise ValueError("Aria2Pool needs at least one instance")
+        self.lock = threading.Lock()
+        self.loads = {}
+        self.stat_time = 0
+
+    def __len__(self) -> int:
+        return len(self.instances)
+
+    def __iter__(self):
+        return iter(self.instances)
+
+    def load_of(self, stat: dict) -> int:
+        if self.strategy == "active":
+            return int(stat["numActive"])+int(stat["numWaiting"])
+        else:
+            return int(stat["downloadSpeed"])
+
+    def refresh_loads(self) -> None:
+        loads = {}  # index of instance -> load
+        for i, rpc in enumerate(self.instances):
+            try:
+                loads[i] = self.load_of(rpc.getGlobalStat())
+            except self.unavailable_errors as e:
+                logging.warning("aria2 instance %s:%s unavailable: %s" %
+                                (rpc.host, rpc.port, e))
+        if len(loads) == 0:
+            raise ConnectionError("no aria2 instance in pool is available")
+        self.loads = loads
+        self.stat_time = time.monotonic()
+
+    def select(self) -> Aria2Rpc:
+        '''
+        picks the least loaded instance. stats are cached for stat_ttl, in between picks are counted locally so bursts are spread too
+        '''
+        with self.lock:
+            if time.monotonic()-self.stat_time >= self.stat_ttl:
+                self.refresh_loads()
+            i = min(self.loads, key=self.loads.get)
+            if self.strategy == "active":
+                self.loads[i] += 1
+            else:
+                # no speed yet for a new download, spread by the average of the pool instead
+                self.loads[i] += max(sum(self.loads.values()) //
+                                     len(self.loads), 1)
+            return self.instances[i]
+
+    def download(self, url: list, pwd: str = None, filename: str = None, proxy: str = None, **raw_opts) -> Aria2Task:
+        return self.select().download(url, pwd, filename, proxy, **raw_opts)
+
+    def wget(self, url: str, pwd: str = None, filename: str = None, **kwargs) -> Aria2Task:
+        return self.select().wget(url, pwd, filename, **kwargs)
+
+    @property
+    def tasks(self) -> set:
+        tasks = set()
+        for rpc in self.instances:
+            tasks.update(rpc.tasks)
+        return tasks
+
+    def getGlobalStat(self) -> dict:
+        '''
+        getGlobalStat of all instances summed up, plus the number of instances answered
+        '''
+        total = {"instances": 0}
+        for rpc in self.instances:
+            try:
+                stat = rpc.getGlobalStat()
+            except self.unavailable_errors:
+                continue
+            total["instances"] += 1
+            for key in stat:
+                total[key] = total.get(key, 0)+int(stat[key])
+        return total
+
+    def quit(self) -> None:
+        for rpc in self.instances:
+            rpc.quit()
+
+
+if __name__ == "__main__":
+    pass
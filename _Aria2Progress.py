@@ -0,0 +1,132 @@
+#!/bin/python3
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+
+
+class Aria2Progress():
+    '''
+    draws progress bars of many downloads, one line each. redraws are capped at fps, no matter how often update() is called,
+    only changed lines are rewritten and every frame is one write to stream
+    '''
+    # terminal width is shared by all renderers, refreshed on SIGWINCH
+    width = None
+    height = None
+    winch_installed = False
+
+    @staticmethod
+    def unitconv(unit_Bytes: int) -> str:
+        if unit_Bytes < 1024:
+            return "%dB" % unit_Bytes
+        elif unit_Bytes < 1048576:
+            num = unit_Bytes/1024
+            unit = "KB"
+        elif unit_Bytes < 1073741824:
+            num = unit_Bytes/1048576
+            unit = "MB"
+        else:
+            num = unit_Bytes/1073741824
+            unit = "GB"
+        # 3 significant digits, fixed point so the width doesn't jump around
+        if num >= 100:
+            return "%.0f%s" % (num, unit)
+        elif num >= 10:
+            return "%.1f%s" % (num, unit)
+        else:
+            return "%.2f%s" % (num, unit)
+
+    @classmethod
+    def refresh_width(cls, *_) -> int:
+        try:
+            cls.width, cls.height = os.get_terminal_size()
+        except (OSError, ValueError):
+            cls.width, cls.height = 80, 24
+        return cls.width
+
+    @classmethod
+    def install_winch(cls) -> None:
+        if cls.winch_installed or not hasattr(signal, "SIGWINCH"):
+            return
+        if threading.current_thread() is not threading.main_thread():
+            # signal handlers can only be set from main thread, width will be checked once per renderer instead
+            return
+        previous = signal.getsignal(signal.SIGWINCH)
+
+        def on_winch(signum, frame):
+            cls.refresh_width()
+            if callable(previous):
+                previous(signum, frame)
+        signal.signal(signal.SIGWINCH, on_winch)
+        cls.winch_installed = True
+
+    @classmethod
+    def line(cls, current: int, total: int, speed: int, name: str = "", width: int = None) -> str:
+        if width == None:
+            width = cls.width or cls.refresh_width()
+        if current > total:
+            current = total
+        percent = current*100/total if total else 0.0
+        stats = "%3.0f%% %s/%s %s/S" % (percent, cls.unitconv(current),
+                                        cls.unitconv(total), cls.unitconv(speed))
+        if name:
+            name = name[:max(width//4, 8)]+" "
+        bar_width = width-len(name)-len(stats)-4
+        if bar_width <= 0:
+            return (name+stats)[:width-1]
+        bar_used = int(bar_width*percent/100)
+        return "%s[%s%s] %s" % (name, "█"*bar_used, " "*(bar_width-bar_used), stats)
+
+    def __init__(self, stream=None, fps: float = 10) -> None:
+        self.stream = stream if stream != None else sys.stdout
+        self.interval = 1/fps
+        self.last_draw = 0
+        self.lines = []
+        self.install_winch()
+        if self.width == None or not self.winch_installed:
+            self.refresh_width()
+
+    def update(self, rows: list, force: bool = False) -> bool:
+        '''
+        rows are (name, current, total, speed), returns False when skipped by the frame rate cap
+        '''
+        now = time.monotonic()
+        if not force and now-self.last_draw < self.interval:
+            return False
+        self.last_draw = now
+        width = self.width
+        # lines scrolled out of the screen can't be reached by the cursor anymore
+        max_rows = max(self.height-1, 1)
+        lines = [self.line(current, total, speed, name, width)
+                 for name, current, total, speed in rows[:max_rows]]
+        if len(rows) > max_rows:
+            lines[-1] = ("... and %s more" % (len(rows)-max_rows+1))[:width-1]
+        if lines == self.lines:
+            return True
+        out = []
+        if self.lines:
+            # back to the first line drawn last frame
+            out.append("\x1b[%dF" % len(self.lines))
+        for i, line in enumerate(lines):
+            if i < len(self.lines) and self.lines[i] == line:
+                out.append("\x1b[1E")
+            else:
+                out.append(line+"\x1b[K\n")
+        if len(lines) < len(self.lines):
+            out.append("\x1b[J")
+        self.lines = lines
+        try:
+            self.stream.write("".join(out))
+            self.stream.flush()
+        except (OSError, ValueError) as e:
+            logging.debug("cannot draw progress: %s" % e)
+        return True
+
+    def close(self) -> None:
+        self.lines = []
+
+
+if __name__ == "__main__":
+    pass
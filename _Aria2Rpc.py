@@ -4,18 +4,32 @@ import logging
 import xmlrpc.client
 import time
 import subprocess
+import threading
+import weakref
+import socket
+import json
 from copy import copy
+from itertools import islice
+from typing import Generator, Iterable
 import logging
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     from http.client import HTTPException
 except ImportError:
     logging.warning("requests not installed, you cannot use jsonrpc api!")
+try:
+    import websocket
+except ImportError:
+    websocket = None
 from uuid import uuid4
 if __package__ == "":
     from _DoNothing import do_nothing
+    from _Aria2Progress import Aria2Progress
 else:
     from ._DoNothing import do_nothing
+    from ._Aria2Progress import Aria2Progress
 
 
 class DownloadError(Exception):
@@ -33,10 +47,12 @@ class Aria2Task():
         self.gid = gid
 
     def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        # methods known by Aria2Rpc.load_methods are generated on this class and never get here
         def __defaultMethod(*args):
-            newargs = (self.gid,) + args
-            method = getattr(self.rpc, name)
-            return method(*newargs)
+            return self.rpc._call(name, (self.gid,) + args)
         return __defaultMethod
 
     def __str__(self) -> str:
@@ -68,6 +84,7 @@ class Aria2Task():
                 "gid": self.gid
             })
             rsp = self.rpc.addUri(urls, options)
+            self.rpc.status_cache.pop(self.gid, None)
             logging.info("retry failed task %s" % self.gid)
             return self
         else:
@@ -82,64 +99,178 @@ class Aria2Task():
             return False
 
     def get_status(self) -> str:
-        status = self.tellStatus()['status']
+        status = self.rpc.cached_status(self.gid)['status']
         return status
 
     def wait(self, interval: int = 1) -> None:
-        while self.is_running():
-            time.sleep(interval)
+        while True:
+            seq = self.rpc.event_sequence(self.gid)
+            if not self.is_running():
+                return
+            self.rpc.wait_event(self.gid, seq, interval)
 
 
-class Aria2Rpc():
-    @staticmethod
-    def unitconv(unit_Bytes: int) -> str:
-        if unit_Bytes < 1024:
-            num = float(unit_Bytes)
-            unit = 'B'
-        elif unit_Bytes < 1048756:
-            num = unit_Bytes/1024
-            unit = 'KB'
-        elif unit_Bytes < 1073741824:
-            num = unit_Bytes/1048756
-            unit = 'MB'
-        else:
-            num = unit_Bytes/1073741824
-            unit = 'GB'
-        if num >= 100 or unit == 'B':
-            out = "%.0f%s" % (num, unit)
-        else:
-            out = '{0:.3}{1}'.format(num, unit)
-        return out
+class Aria2Batch():
+    '''
+    queues rpc calls and sends them in one request, use it as a context manager:
 
-    @staticmethod
-    def progressBar(current: int, total: int, speed: int) -> None:
-        if current > total:
-            current = total
-
-        speed_str = Aria2Rpc.unitconv(speed)+"/S"
-        current_str = Aria2Rpc.unitconv(current)
-        total_str = Aria2Rpc.unitconv(total)
-        if total == 0:
-            percent = float(0)
-        else:
-            percent = current/total*100
-        percent_str = "{0: >3.0f}%".format(percent)
+        with rpc.batch() as b:
+            for task in tasks:
+                b.tellStatus(task.gid)
+        results = b.results
+    '''
 
-        width = os.get_terminal_size().columns
+    def __init__(self, rpc_obj: object) -> None:
+        self.rpc = rpc_obj  # Aria2Rpc object
+        self.calls = []
+        self.results = None
 
-        bar_width = width-32
-        if bar_width <= 0:
-            bar = ""
-        else:
-            bar_used = int(bar_width*(percent/100))
-            bar_space = bar_width-bar_used
-            bar = "[%s%s]" % ("█"*bar_used, " "*bar_space)
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def __queueMethod(*args) -> int:
+            self.calls.append((name, args))
+            return len(self.calls)-1
+        return __queueMethod
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type == None:
+            self.execute()
+
+    def execute(self) -> list:
+        self.results = self.rpc.multicall(self.calls)
+        self.calls = []
+        return self.results
+
+
+class Aria2Notifier():
+    '''
+    listens aria2 websocket notifications on a background thread, so waiters can block on events of a gid instead of polling
+    '''
+    reconnect_interval = 1
+
+    def __init__(self, url: str, on_event=None) -> None:
+        '''
+        on_event is called with the gid of every event before its waiters wake up. bound methods are held weakly,
+        so the listener thread does not keep their object alive
+        '''
+        self.url = url
+        self.on_event = weakref.WeakMethod(on_event) if hasattr(
+            on_event, "__self__") else (lambda: on_event)
+        self.lock = threading.Lock()
+        self.seqs = {}  # gid -> number of events received
+        self.conds = {}  # gid -> Condition of waiters
+        self.waiting = {}  # gid -> number of waiters
+        self.connected = threading.Event()
+        self.running = True
+        self.ws = None
+        self.thread = threading.Thread(
+            target=self.run, name="Aria2Notifier", daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while self.running:
+            try:
+                self.ws = websocket.create_connection(self.url)
+            except (websocket.WebSocketException, OSError) as e:
+                logging.debug("cannot connect aria2 websocket %s: %s" %
+                              (self.url, e))
+                time.sleep(self.reconnect_interval)
+                continue
+            logging.debug("connected to aria2 websocket %s" % self.url)
+            self.connected.set()
+            # events may have been missed while disconnected
+            self.wake_all()
+            try:
+                while self.running:
+                    msg = self.ws.recv()
+                    if msg:
+                        self.dispatch(json.loads(msg))
+            except (websocket.WebSocketException, OSError, ValueError) as e:
+                if self.running:
+                    logging.warning(
+                        "aria2 websocket %s disconnected: %s" % (self.url, e))
+            finally:
+                self.connected.clear()
+                self.ws.shutdown()
+                self.wake_all()
+
+    def dispatch(self, msg: dict) -> None:
+        if "method" not in msg:
+            return
+        for param in msg.get("params", []):
+            gid = param["gid"]
+            logging.debug("received %s for task %s" % (msg["method"], gid))
+            on_event = self.on_event()
+            if on_event:
+                on_event(gid)
+            with self.lock:
+                self.seqs[gid] = self.seqs.get(gid, 0)+1
+                if gid in self.conds:
+                    self.conds[gid].notify_all()
+
+    def wake_all(self) -> None:
+        with self.lock:
+            gids = list(self.conds)
+        on_event = self.on_event()
+        if on_event:
+            for gid in gids:
+                on_event(gid)
+        with self.lock:
+            for gid in self.conds:
+                self.seqs[gid] = self.seqs.get(gid, 0)+1
+                self.conds[gid].notify_all()
+
+    def alive(self) -> bool:
+        return self.connected.is_set()
+
+    def sequence(self, gid: str) -> int:
+        '''
+        call this before checking task status, then pass it to wait(), so events between the check and wait() are not lost
+        '''
+        with self.lock:
+            return self.seqs.get(gid, 0)
+
+    def wait(self, gid: str, seq: int, timeout: float = None) -> bool:
+        with self.lock:
+            if gid not in self.conds:
+                self.conds[gid] = threading.Condition(self.lock)
+                self.waiting[gid] = 0
+            self.waiting[gid] += 1
+            try:
+                return self.conds[gid].wait_for(lambda: self.seqs.get(gid, 0) != seq, timeout)
+            finally:
+                self.waiting[gid] -= 1
+                if self.waiting[gid] == 0:
+                    self.conds.pop(gid)
+                    self.waiting.pop(gid)
 
-        space_num = width-len(bar+percent_str +
-                              current_str+total_str+speed_str)-6
-        out_str = "\r%s %s %s %s/%s %s" % (bar, percent_str,
-                                           " "*space_num, current_str, total_str, speed_str)
-        print(out_str, end="")
+    def close(self) -> None:
+        self.running = False
+        if self.ws:
+            # don't wait for the closing handshake, just unblock recv() of the listener thread
+            self.ws.abort()
+
+
+class Aria2Rpc():
+    # defaults so __getattr__ is not reached for them on a half initialized object
+    methods = None
+    notifier = None
+    starter = None
+
+    unitconv = staticmethod(Aria2Progress.unitconv)
+
+    @staticmethod
+    def progressBar(current: int, total: int, speed: int) -> None:
+        # single line version, see Aria2Progress for many downloads and frame rate capping
+        print("\r"+Aria2Progress.line(current, total, speed), end="")
 
     @staticmethod
     def readAria2Conf(conf_path: str) -> dict:
@@ -172,14 +303,82 @@ class Aria2Rpc():
             new_args.update({new_key: value})
         return new_args
 
+    @staticmethod
+    def add_secret(secret: str, args: tuple) -> tuple:
+        if secret == "token:None":
+            return args
+        else:
+            return (secret,) + args
+
+    @staticmethod
+    def jsonrpc_batch(secret: str, calls: list) -> list:
+        return [{
+            'jsonrpc': '2.0',
+            'id': str(i),
+            'method': 'aria2.'+name,
+            'params': Aria2Rpc.add_secret(secret, tuple(args))
+        } for i, (name, args) in enumerate(calls)]
+
+    @staticmethod
+    def jsonrpc_results(calls: list, jsonrsp) -> list:
+        if type(jsonrsp) != list:
+            raise RuntimeError(jsonrsp["error"])
+        rsp_by_id = {rsp["id"]: rsp for rsp in jsonrsp}
+        results = []
+        for i in range(len(calls)):
+            rsp = rsp_by_id.get(str(i))
+            if rsp == None:
+                results.append(RuntimeError(
+                    "no response for call %s" % calls[i][0]))
+            elif "result" in rsp:
+                results.append(rsp["result"])
+            else:
+                results.append(RuntimeError(rsp["error"]))
+        return results
+
+    @staticmethod
+    def download_options(task_opts: dict, pwd: str = None, filename: str = None, proxy: str = None, raw_opts: dict = {}) -> dict:
+        # old args compatiblity
+        method_opts = {
+            "dir": pwd,
+            "all-proxy": proxy,
+            "out": filename
+        }
+        for opt in method_opts:
+            if method_opts[opt] != None:
+                task_opts.update({opt: method_opts[opt]})
+
+        # process raw args for addUri format
+        task_opts.update(Aria2Rpc.kwargs_process(raw_opts))
+        return task_opts
+
     bin_path = "aria2c"
 
     @classmethod
     def setAria2Bin(cls, bin_path: str) -> None:
         cls.bin_path = bin_path
 
-    def __init__(self, host: str = "127.0.0.1", port: int = 6800, passwd: str = None, protocal: str = "http", api: str = "xmlrpc", **kwargs) -> None:  # rework to use **kwargs
+    def __init__(self, host: str = "127.0.0.1", port: int = 6800, passwd: str = None, protocal: str = "http", api: str = "xmlrpc", conn_pool_size: int = 10, conn_timeout: float = 30, conn_retries: int = 3, conn_backoff: float = 0.1, notification: bool = False, notification_fallback: float = 30, status_ttl: float = 0, start_timeout: float = 10, start_async: bool = False, **kwargs) -> None:  # rework to use **kwargs
         self.tasks = set()
+        self.sessionID = None
+        self.starter = None
+        self.start_timeout = start_timeout
+        self.host = host
+        self.port = port
+        self.status_ttl = status_ttl
+        self.status_cache = {}
+        self.status_wanted = set()  # gids asked from cached_status since the last sweep
+        self.status_time = 0
+        self.status_lock = threading.RLock()
+        self.notifier = None
+        self.notification_fallback = notification_fallback
+        if notification:
+            if websocket == None:
+                logging.warning(
+                    "websocket-client not installed, falling back to polling for task status")
+            else:
+                self.notifier = Aria2Notifier("%s://%s:%s/jsonrpc" % (
+                    "wss" if protocal == "https" else "ws", host, port), self.drop_status)
         self.api = api
         self.secret = "token:%s" % passwd
         self.config = kwargs
@@ -187,8 +386,19 @@ class Aria2Rpc():
             connection = xmlrpc.client.ServerProxy(
                 "%s://%s:%s/rpc" % (protocal, host, port))
             self.aria2 = connection.aria2
+            self.system = connection.system
+            self.remotes = {}  # name -> xmlrpc method of self.aria2
         elif api == "jsonrpc":
             self.connection_url = "%s://%s:%s/jsonrpc" % (protocal, host, port)
+            # one keep-alive connection pool per instance, shared by the per-thread sessions.
+            # only failed connects are retried, a request that may have reached aria2 is never sent twice
+            retry = Retry(total=conn_retries, connect=conn_retries, read=0, other=0, status=0,
+                          backoff_factor=conn_backoff, raise_on_status=False)
+            # no retries until the first probe is answered, a closed local port goes straight to starting aria2c
+            self.adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=conn_pool_size, max_retries=0)
+            self.conn_timeout = conn_timeout
+            self.local = threading.local()
         else:
             raise ValueError("Unsupported api type %s" % api)
         try:
@@ -205,66 +415,255 @@ class Aria2Rpc():
                     "rpc_secret": passwd,
                     "enable_rpc": True
                 })
-                self.start()
+                self.start(block=not start_async)
             else:
                 raise
         except (xmlrpc.client.Fault, RuntimeError):
             logging.error("aria2 rpc password ircorrect")
             raise ValueError("password ircorrect")
+        if api == "jsonrpc":
+            self.adapter.max_retries = retry
 
     def __getattr__(self, name):
-
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if Aria2Rpc.methods == None:
+            self.load_methods()
+            if name in Aria2Rpc.methods:
+                return getattr(self, name)
+
+        # unknown to system.listMethods, call it anyway and let aria2 decide
         def __defaultMethod(*args):
-            if self.secret == "token:None":
-                newargs = args
-            else:
-                newargs = (self.secret,) + args
+            return self._call(name, args)
+
+        return __defaultMethod
+
+    @staticmethod
+    def _rpc_method(name: str):
+        def method(self, *args):
+            return self._call(name, args)
+        method.__name__ = name
+        return method
+
+    @staticmethod
+    def _task_method(name: str):
+        def method(self, *args):
+            return self.rpc._call(name, (self.gid,) + args)
+        method.__name__ = name
+        return method
+
+    @classmethod
+    def generate_methods(cls, names: Iterable) -> None:
+        '''
+        generates rpc methods on Aria2Rpc and Aria2Task, so calling them is a plain method lookup instead of a __getattr__ and a new closure every time
+        '''
+        methods = set()
+        for name in names:
+            methods.add(name)
+            if name not in Aria2Rpc.__dict__:
+                setattr(Aria2Rpc, name, cls._rpc_method(name))
+            if name not in Aria2Task.__dict__:
+                setattr(Aria2Task, name, cls._task_method(name))
+        Aria2Rpc.methods = frozenset(methods)
+
+    def load_methods(self) -> None:
+        if self.starter:
+            self.wait_started()
+        if self.api == "xmlrpc":
+            try:
+                names = self.system.listMethods()
+            except xmlrpc.client.Fault as e:
+                logging.warning("system.listMethods failed: %s" % e)
+                names = []
+        else:
+            names = self._post_json({
+                'jsonrpc': '2.0',
+                'id': 'Aria2Rpc',
+                'method': 'system.listMethods',
+                'params': []
+            }).get("result", [])
+        logging.debug("aria2 rpc methods: %s" % names)
+        self.generate_methods(name[len("aria2."):]
+                              for name in names if name.startswith("aria2."))
+
+    def _add_secret(self, args: tuple) -> tuple:
+        return self.add_secret(self.secret, args)
+
+    def _session(self) -> "requests.Session":
+        # requests.Session is not thread safe, so every thread gets its own, all of them mounting the same pool
+        try:
+            return self.local.session
+        except AttributeError:
+            session = requests.Session()
+            session.mount(self.connection_url, self.adapter)
+            self.local.session = session
+            return session
+
+    def _post_json(self, jsonreq):
+        try:
+            rsp = self._session().post(url=self.connection_url,
+                                       json=jsonreq, timeout=self.conn_timeout)
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionRefusedError(e)
+        if not rsp.ok:
+            logging.critical("rpc server return a error status code %s, message: %s" % (
+                rsp.status_code, rsp.text))
+            raise HTTPException(rsp.status_code, rsp.text)
+        return rsp.json()
+
+    def _call(self, name: str, args: tuple):
+        if self.starter:
+            self.wait_started()
+        newargs = self._add_secret(args)
+        if logging.root.isEnabledFor(logging.DEBUG):
             logging.debug("calling rpc method: %s, args: %s" %
                           (name, str(newargs)))
-            if self.api == "xmlrpc":
-                method = getattr(self.aria2, name)
-                try:
-                    result = method(*newargs)
-                except xmlrpc.client.Fault as e:
-                    raise RuntimeError(e)
-
-            elif self.api == "jsonrpc":
-                jsonreq = {
-                    'jsonrpc': '2.0',
-                    'id': 'Aria2Rpc',
-                    'method': 'aria2.'+name,
-                    'params': newargs
-                }
-                try:
-                    rsp = requests.post(url=self.connection_url, json=jsonreq)
-                except requests.exceptions.ConnectionError as e:
-                    raise ConnectionRefusedError(e)
-                if not rsp.ok:
-                    logging.critical("rpc server return a error status code %s, message: %s" % (
-                        rsp.status_code, rsp.text))
-                    raise HTTPException(rsp.status_code, rsp.text)
-                jsonrsp = rsp.json()
-                if "result" in jsonrsp:
-                    result = jsonrsp["result"]
+        if self.api == "xmlrpc":
+            method = self.remotes.get(name)
+            if method == None:
+                method = self.remotes[name] = getattr(self.aria2, name)
+            try:
+                result = method(*newargs)
+            except xmlrpc.client.Fault as e:
+                raise RuntimeError(e)
+
+        elif self.api == "jsonrpc":
+            jsonreq = {
+                'jsonrpc': '2.0',
+                'id': 'Aria2Rpc',
+                'method': 'aria2.'+name,
+                'params': newargs
+            }
+            jsonrsp = self._post_json(jsonreq)
+            if "result" in jsonrsp:
+                result = jsonrsp["result"]
+            else:
+                raise RuntimeError(jsonrsp["error"])
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("rpc method: %s, result: %s" %
+                          (name, str(result)))
+        return result
+
+    def multicall(self, calls: list) -> list:
+        '''
+        sends a list of (method_name, args) in one request, using system.multicall for xmlrpc or a batch array for jsonrpc.
+        returns results in the same order, a failed call is returned as a RuntimeError instance instead of raising
+        '''
+        if len(calls) == 0:
+            return []
+        if self.starter:
+            self.wait_started()
+        logging.debug("calling %s rpc methods in one request" % len(calls))
+        results = []
+        if self.api == "xmlrpc":
+            reqs = [{"methodName": "aria2."+name, "params": list(self._add_secret(tuple(args)))}
+                    for name, args in calls]
+            try:
+                rsps = self.system.multicall(reqs)
+            except xmlrpc.client.Fault as e:
+                raise RuntimeError(e)
+            for rsp in rsps:
+                if type(rsp) == dict:
+                    results.append(RuntimeError(
+                        xmlrpc.client.Fault(rsp["faultCode"], rsp["faultString"])))
                 else:
-                    raise RuntimeError(jsonrsp["error"])
-            if logging.root.isEnabledFor(logging.DEBUG):
-                logging.debug("rpc method: %s, result: %s" %
-                              (name, str(result)))
-            return result
+                    results.append(rsp[0])
+        elif self.api == "jsonrpc":
+            jsonrsp = self._post_json(self.jsonrpc_batch(self.secret, calls))
+            results = self.jsonrpc_results(calls, jsonrsp)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("multicall results: %s" % str(results))
+        return results
+
+    def batch(self) -> Aria2Batch:
+        return Aria2Batch(self)
+
+    status_keys = ["gid", "status", "totalLength", "completedLength",
+                   "downloadSpeed", "errorCode", "errorMessage"]
+
+    def refresh_status(self, gids: list = ()) -> dict:
+        '''
+        refreshes status_cache with one tellActive/tellWaiting/tellStopped sweep, asking only for status_keys.
+        the sweep is sized for gids and the ones asked from cached_status since the last sweep,
+        those missing from it (e.g. beyond the size of the queues) are fetched with one batched tellStatus
+        '''
+        with self.status_lock:
+            gids = list(dict.fromkeys(list(gids)+list(self.status_wanted)))
+            self.status_wanted = set()
+            num = max(len(gids), 1)
+            results = self.multicall([
+                ("tellActive", (self.status_keys,)),
+                ("tellWaiting", (0, num, self.status_keys)),
+                # negative offset for the most recent ones
+                ("tellStopped", (-1, num, self.status_keys))
+            ])
+            cache = {}
+            for r in results:
+                if isinstance(r, Exception):
+                    raise r
+                for status in r:
+                    cache[status["gid"]] = status
+            missing = [gid for gid in gids if gid not in cache]
+            for gid, r in zip(missing, self.multicall([("tellStatus", (gid, self.status_keys)) for gid in missing])):
+                if not isinstance(r, Exception):
+                    cache[gid] = r
+            self.status_cache = cache
+            self.status_time = time.monotonic()
+            return cache
+
+    def cached_status(self, gid: str) -> dict:
+        '''
+        status of gid from status_cache, which is refreshed by one sweep for all tasks when older than status_ttl.
+        with status_ttl=0 it's a plain tellStatus
+        '''
+        if self.status_ttl <= 0:
+            return self.tellStatus(gid, self.status_keys)
+        # waiters coming in while another thread refreshes get the fresh result
+        with self.status_lock:
+            self.status_wanted.add(gid)
+            if time.monotonic()-self.status_time >= self.status_ttl:
+                self.refresh_status((gid,))
+            status = self.status_cache.get(gid)
+            if status == None:
+                status = self.tellStatus(gid, self.status_keys)
+                self.status_cache[gid] = status
+        return status
 
-        return __defaultMethod
+    def drop_status(self, gid: str) -> None:
+        '''
+        forgets the cached status of gid, so the next cached_status asks aria2 again. called on every notification of gid
+        '''
+        # waits for a running refresh_status, which could otherwise put back a status older than the event
+        with self.status_lock:
+            self.status_cache.pop(gid, None)
+
+    def wait_event(self, gid: str, seq: int, interval: float) -> None:
+        '''
+        blocks until a notification for gid arrives, or sleeps interval seconds when notifications are not available
+        '''
+        if seq != None and self.notifier and self.notifier.alive():
+            self.notifier.wait(gid, seq, self.notification_fallback)
+        else:
+            time.sleep(interval)
+
+    def event_sequence(self, gid: str) -> int:
+        if self.notifier:
+            return self.notifier.sequence(gid)
+        return None
 
     def __str__(self) -> str:
         return self.sessionID
 
     def __hash__(self) -> int:
-        hash(self.sessionID)
+        return hash(self.sessionID)
 
     def __eq__(self, __o: object) -> bool:
         return self.sessionID == __o.sessionID
 
-    def start(self) -> None:
+    def start(self, block: bool = True) -> None:
+        '''
+        spawns aria2c with self.config, returns once its rpc answers. with block=False it returns right away, the first rpc call waits for it
+        '''
         cmd = [self.bin_path, "--no-conf"]
         args = self.kwargs_process(self.config)
         for arg in args:
@@ -278,38 +677,80 @@ class Aria2Rpc():
         self.process.cmd = " ".join(cmd)
         logging.debug("started subrprocess cmd %s, pid %s" %
                       (self.process.cmd, self.process.pid))
-        for i in range(10):
-            try:
-                self.sessionID = self.getSessionInfo()['sessionId']
-                return
-            except ConnectionError:
-                time.sleep(0.1)
-        logging.critical(
-            "cannot connect to aria rpc after 1s, please check your args %s" % self.config)
+        if block:
+            self._wait_rpc_ready()
+        else:
+            self.start_error = None
+            self.starter = threading.Thread(
+                target=self._start_in_background, name="Aria2Starter", daemon=True)
+            self.starter.start()
 
-    def download(self, url: list, pwd: str = None, filename: str = None, proxy: str = None, **raw_opts) -> Aria2Task:
+    def _start_in_background(self) -> None:
+        try:
+            self._wait_rpc_ready()
+        except Exception as e:
+            self.start_error = e
+
+    def _wait_rpc_ready(self) -> None:
+        # poll the rpc port with exponential backoff until it accepts connections, the child dies or start_timeout passes
+        deadline = time.monotonic()+self.start_timeout
+        delay = 0.005
+        while True:
+            returncode = self.process.poll()
+            if returncode != None:
+                logging.critical("aria2 subprocess exited with code %s before rpc is ready, cmd %s" % (
+                    returncode, self.process.cmd))
+                delattr(self, "process")
+                raise RuntimeError(
+                    "aria2 subprocess exited with code %s" % returncode)
+            try:
+                socket.create_connection(
+                    (self.host, self.port), timeout=max(deadline-time.monotonic(), 0.01)).close()
+                break
+            except OSError:
+                pass
+            remaining = deadline-time.monotonic()
+            if remaining <= 0:
+                logging.critical("cannot connect to aria rpc after %ss, please check your args %s" % (
+                    self.start_timeout, self.config))
+                self.process.kill()
+                self.process.wait()
+                delattr(self, "process")
+                raise TimeoutError(
+                    "aria2 rpc is not ready after %ss" % self.start_timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay*2, 0.2)
+        self.sessionID = self.getSessionInfo()['sessionId']
+        logging.debug("aria2 rpc at port %s is ready" % self.port)
+
+    def wait_started(self) -> None:
+        '''
+        blocks until a start(block=False) finishes, raising its error if it failed. rpc calls do this implicitly
+        '''
+        starter = self.starter
+        if starter == None or starter is threading.current_thread():
+            return
+        starter.join()
+        self.starter = None
+        if self.start_error != None:
+            raise self.start_error
+
+    def session_options(self) -> dict:
         # use session config
         if "process" in self.__dict__:
-            task_opts = {}
+            return {}
         else:
-            task_opts = self.kwargs_process(self.config)
+            return self.kwargs_process(self.config)
+
+    def download(self, url: list, pwd: str = None, filename: str = None, proxy: str = None, **raw_opts) -> Aria2Task:
+        task_opts = self.session_options()
 
         # convert url or urls addUri
         if type(url) == str:
             url = [url]
 
-        # old args compatiblity
-        method_opts = {
-            "dir": pwd,
-            "all-proxy": proxy,
-            "out": filename
-        }
-        for opt in method_opts:
-            if method_opts[opt] != None:
-                task_opts.update({opt: method_opts[opt]})
-
-        # process raw args for addUri format
-        task_opts.update(self.kwargs_process(raw_opts))
+        task_opts = self.download_options(
+            task_opts, pwd, filename, proxy, raw_opts)
 
         req = self.addUri(url, task_opts)
         logging.info("Started download %s as task %s" % (url, req))
@@ -326,12 +767,17 @@ class Aria2Rpc():
             progress_bar = False
         if progress_bar:
             logging.debug("using progress bar")
-            pbar = self.progressBar
+            progress = Aria2Progress()
+
+            def pbar(current: int, total: int, speed: int, force: bool = False):
+                progress.update([("", current, total, speed)], force)
         else:
             logging.debug("disable progress bar")
             pbar = do_nothing
         while True:
-            r = task.tellStatus()
+            # progress bar needs polling to refresh
+            seq = None if progress_bar else self.event_sequence(task.gid)
+            r = self.cached_status(task.gid)
             status = r['status']
             if status == "error":
                 if retry_left <= 0:
@@ -346,10 +792,10 @@ class Aria2Rpc():
             elif status in ("active", "paused", "waiting"):
                 pbar(int(r['completedLength']), int(
                     r['totalLength']), int(r['downloadSpeed']))
-                time.sleep(refresh_interval)
+                self.wait_event(task.gid, seq, refresh_interval)
             elif status == "complete":
                 pbar(int(r['completedLength']), int(
-                    r['totalLength']), int(r['downloadSpeed']))
+                    r['totalLength']), int(r['downloadSpeed']), True)
                 logging.info("task %s complete" % task.gid)
                 return task
             elif status == "removed":
@@ -361,6 +807,87 @@ class Aria2Rpc():
                 logging.critical(error_msg)
                 raise ValueError(error_msg)
 
+    def bulk_download(self, jobs: Iterable, max_active: int = 16, retry: int = 5, remove_failed_task: bool = True, refresh_interval: float = 1, skip_failed: bool = False, progress_bar: bool = False) -> Generator[Aria2Task, None, None]:
+        '''
+        downloads jobs of url or (url, options) and yields tasks as they complete, keeping at most max_active of them in aria2.
+        jobs is consumed lazily, new tasks are added with one batched addUri and all running tasks are polled with one refresh_status sweep per refresh_interval.
+        failed tasks are retried with Aria2Task.retry, after that DownloadError is raised, or the task is dropped if skip_failed
+        '''
+        jobs = iter(jobs)
+        progress = Aria2Progress() if progress_bar else None
+        running = {}  # gid -> [task, retry left]
+        exhausted = False
+        base_opts = self.session_options()
+        while True:
+            if not exhausted and len(running) < max_active:
+                calls = []
+                for job in islice(jobs, max_active-len(running)):
+                    if type(job) in (list, tuple):
+                        url, opts = job
+                    else:
+                        url, opts = job, {}
+                    if type(url) == str:
+                        url = [url]
+                    calls.append(("addUri", (url, self.download_options(
+                        copy(base_opts), raw_opts=opts))))
+                if len(calls) < max_active-len(running):
+                    exhausted = True
+                for call, gid in zip(calls, self.multicall(calls)):
+                    if isinstance(gid, Exception):
+                        if not skip_failed:
+                            raise gid
+                        logging.error("failed to add %s: %s" % (call[1][0], gid))
+                        continue
+                    logging.info("Started download %s as task %s" %
+                                 (call[1][0], gid))
+                    task = Aria2Task(gid, self)
+                    self.tasks.add(task)
+                    running[gid] = [task, retry]
+            if len(running) == 0:
+                if progress:
+                    progress.update([], True)
+                return
+
+            finished = 0
+            statuses = self.refresh_status(list(running))
+            if progress:
+                progress.update([(gid, int(statuses[gid]["completedLength"]), int(statuses[gid]["totalLength"]), int(
+                    statuses[gid]["downloadSpeed"])) for gid in running if gid in statuses])
+            for gid in list(running):
+                task, retry_left = running[gid]
+                if gid not in statuses:
+                    status, error_msg = "removed", "task %s not found" % gid
+                else:
+                    status, error_msg = statuses[gid]["status"], statuses[gid].get(
+                        "errorMessage")
+                if status == "complete":
+                    logging.info("task %s complete" % gid)
+                    running.pop(gid)
+                    # a long bulk download would otherwise keep every task it ever ran in self.tasks
+                    self.tasks.discard(task)
+                    finished += 1
+                    yield task
+                elif status == "error" and retry_left > 0:
+                    logging.warning("%s, gonna retry %s/%s" %
+                                    (error_msg, retry-retry_left+1, retry))
+                    task.retry(remove_failed_task)
+                    running[gid][1] -= 1
+                elif status in ("error", "removed"):
+                    running.pop(gid)
+                    self.tasks.discard(task)
+                    finished += 1
+                    if status == "error":
+                        error = DownloadError(error_msg)
+                    else:
+                        error = RuntimeError(
+                            "task %s removed by user" % gid)
+                    if not skip_failed:
+                        raise error
+                    logging.error("task %s failed: %s" % (gid, error))
+            # refill right away when slots are free, otherwise wait for the next tick
+            if finished == 0 or exhausted:
+                time.sleep(refresh_interval)
+
     def quit(self):
         if "process" in self.__dict__:
             logging.debug("calling shutdown for aria2 at port %s, sessionID: %s" %
@@ -374,6 +901,10 @@ class Aria2Rpc():
     def __del__(self):
         logging.debug("__del__ method for Aria2Rpc has been called")
         self.quit()
+        if self.notifier:
+            self.notifier.close()
+        if "adapter" in self.__dict__:
+            self.adapter.close()
         return True
 
 
@@ -0,0 +1,230 @@
+#!/bin/python3
+import asyncio
+import logging
+try:
+    import aiohttp
+except ImportError:
+    logging.warning("aiohttp not installed, you cannot use AsyncAria2Rpc!")
+if __package__ == "":
+    from _Aria2Rpc import Aria2Rpc, DownloadError
+else:
+    from ._Aria2Rpc import Aria2Rpc, DownloadError
+
+
+class AsyncAria2Task():
+    def __init__(self, gid: str, rpc_obj: object) -> None:
+        self.rpc = rpc_obj  # AsyncAria2Rpc object
+        self.gid = gid
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def __defaultMethod(*args):
+            return await self.rpc._call(name, (self.gid,) + args)
+        return __defaultMethod
+
+    def __str__(self) -> str:
+        return self.gid
+
+    def __eq__(self, __o: object) -> bool:
+        return self.gid == __o.gid and self.rpc == __o.rpc
+
+    def __hash__(self) -> int:
+        return hash(self.gid)
+
+    async def retry(self, remove_failed_task: bool = True) -> object:
+        r = await self.tellStatus()
+        if r["status"] != "error":
+            return self
+        if len(r["files"]) != 1:
+            raise ValueError("No support for bittorrent/magnet for now")
+        urls = list(set(url["uri"] for url in r["files"][0]["uris"]))
+        options = await self.getOption()
+        if remove_failed_task:
+            rsp = await self.removeDownloadResult()
+            logging.debug("removed failed task gid %s %s" % (self.gid, rsp))
+        options.update({
+            "gid": self.gid
+        })
+        await self.rpc.addUri(urls, options)
+        logging.info("retry failed task %s" % self.gid)
+        return self
+
+    async def get_status(self) -> str:
+        return (await self.tellStatus(["status"]))["status"]
+
+    async def is_running(self) -> bool:
+        status = await self.get_status()
+        logging.debug("task gid %s status is %s" % (self.gid, status))
+        return status in ("active", "waiting", "paused")
+
+    async def wait(self, interval: float = 1) -> None:
+        while await self.is_running():
+            await asyncio.sleep(interval)
+
+
+class AsyncAria2Rpc():
+    '''
+    asyncio counterpart of Aria2Rpc, jsonrpc only. It won't start a local aria2c, so connect to a running one:
+
+        async with AsyncAria2Rpc(passwd="abc") as rpc:
+            task = await rpc.download(url)
+            await task.wait()
+    '''
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6800, passwd: str = None, protocal: str = "http", conn_pool_size: int = 100, conn_timeout: float = 30, **kwargs) -> None:
+        self.tasks = set()
+        self.secret = "token:%s" % passwd
+        self.config = kwargs
+        self.connection_url = "%s://%s:%s/jsonrpc" % (protocal, host, port)
+        self.conn_pool_size = conn_pool_size
+        self.conn_timeout = conn_timeout
+        self.session = None
+        self.sessionID = None
+
+    async def __aenter__(self):
+        try:
+            await self.connect()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def __defaultMethod(*args):
+            return await self._call(name, args)
+        return __defaultMethod
+
+    def __str__(self) -> str:
+        return self.sessionID
+
+    def __hash__(self) -> int:
+        return hash(self.sessionID)
+
+    def __eq__(self, __o: object) -> bool:
+        return self.sessionID == __o.sessionID
+
+    async def connect(self) -> None:
+        if self.session == None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.conn_pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.conn_timeout))
+        try:
+            self.sessionID = (await self.getSessionInfo())['sessionId']
+        except RuntimeError:
+            logging.error("aria2 rpc password ircorrect")
+            raise ValueError("password ircorrect")
+
+    async def close(self) -> None:
+        if self.session != None:
+            await self.session.close()
+            self.session = None
+
+    async def _post_json(self, jsonreq):
+        if self.session == None:
+            await self.connect()
+        try:
+            async with self.session.post(self.connection_url, json=jsonreq) as rsp:
+                if rsp.status != 200:
+                    text = await rsp.text()
+                    logging.critical("rpc server return a error status code %s, message: %s" % (
+                        rsp.status, text))
+                    raise aiohttp.ClientResponseError(
+                        rsp.request_info, rsp.history, status=rsp.status, message=text)
+                return await rsp.json(content_type=None)
+        except aiohttp.ClientConnectionError as e:
+            raise ConnectionRefusedError(e)
+
+    async def _call(self, name: str, args: tuple):
+        newargs = Aria2Rpc.add_secret(self.secret, args)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("calling rpc method: %s, args: %s" %
+                          (name, str(newargs)))
+        jsonrsp = await self._post_json({
+            'jsonrpc': '2.0',
+            'id': 'AsyncAria2Rpc',
+            'method': 'aria2.'+name,
+            'params': newargs
+        })
+        if "error" in jsonrsp:
+            raise RuntimeError(jsonrsp["error"])
+        return jsonrsp["result"]
+
+    async def multicall(self, calls: list) -> list:
+        '''
+        same as Aria2Rpc.multicall, sends all calls as one jsonrpc batch request
+        '''
+        if len(calls) == 0:
+            return []
+        jsonrsp = await self._post_json(Aria2Rpc.jsonrpc_batch(self.secret, calls))
+        return Aria2Rpc.jsonrpc_results(calls, jsonrsp)
+
+    async def gather_status(self, tasks: list, keys: list = None) -> list:
+        '''
+        tellStatus of all tasks in one request, a failed call is returned as a RuntimeError instance
+        '''
+        args = (keys,) if keys else ()
+        return await self.multicall([("tellStatus", (task.gid,)+args) for task in tasks])
+
+    async def download(self, url: list, pwd: str = None, filename: str = None, proxy: str = None, **raw_opts) -> AsyncAria2Task:
+        if type(url) == str:
+            url = [url]
+        task_opts = Aria2Rpc.download_options(
+            Aria2Rpc.kwargs_process(self.config), pwd, filename, proxy, raw_opts)
+        req = await self.addUri(url, task_opts)
+        logging.info("Started download %s as task %s" % (url, req))
+        task = AsyncAria2Task(req, self)
+        self.tasks.add(task)
+        return task
+
+    async def wget(self, url: str, pwd: str = None, filename: str = None, retry: int = 5, proxy: str = None, remove_failed_task: bool = True, refresh_interval: float = 1, **raw_opts) -> AsyncAria2Task:
+        retry_left = retry
+        task = await self.download(url, pwd, filename, proxy=proxy, **raw_opts)
+        while True:
+            r = await task.tellStatus(["status", "errorMessage"])
+            status = r['status']
+            if status == "error":
+                if retry_left <= 0:
+                    logging.error("download task %s error after %s retry, error message: %s" % (
+                        task.gid, retry, r["errorMessage"]))
+                    raise DownloadError(r["errorMessage"])
+                logging.warning("%s, gonna retry %s/%s" %
+                                (r["errorMessage"], retry-retry_left+1, retry))
+                await task.retry(remove_failed_task)
+                retry_left -= 1
+            elif status in ("active", "paused", "waiting"):
+                await asyncio.sleep(refresh_interval)
+            elif status == "complete":
+                logging.info("task %s complete" % task.gid)
+                return task
+            elif status == "removed":
+                error_msg = "task %s removed by user, exiting" % task.gid
+                logging.warning(error_msg)
+                raise RuntimeError(error_msg)
+            else:
+                error_msg = "undefined status %s" % status
+                logging.critical(error_msg)
+                raise ValueError(error_msg)
+
+    async def wait_all(self, tasks: list, interval: float = 1) -> None:
+        '''
+        waits for all tasks with one batched tellStatus per interval, instead of one per task
+        '''
+        tasks = list(tasks)
+        while tasks:
+            results = await self.gather_status(tasks, ["status"])
+            tasks = [task for task, r in zip(tasks, results)
+                     if not isinstance(r, Exception) and r["status"] in ("active", "waiting", "paused")]
+            if tasks:
+                await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    pass
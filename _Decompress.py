@@ -2,85 +2,242 @@
 from typing import Generator
 import logging
 import os
-from importlib import reload, import_module
-from zipfile import ZipFile
+from importlib import import_module
+from zipfile import ZipFile, is_zipfile
 import mmap
+import time
+from fnmatch import fnmatch
+import ctypes
+import struct
+import zlib
+import gc
+import sys
+import stat
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+if __package__ == "":
+    from _Py7z import Py7z
+else:
+    from ._Py7z import Py7z
+
+
+def _extract_worker(filename: str, use_zipfile: bool, names: list, outdir: str) -> int:
+    # runs in a worker process with its own reader over the file
+    d = Decompress(filename, use_zipfile)
+    d.extractFiles(set(names), outdir)
+    return len(names)
 
 
 class Decompress():
+    # loaded once per process, shared by all instances
     libarchive = None
+    libarchive_error = None
+    libarchive_stale = False
+    libarchive_load_time = None
+    load_lock = threading.Lock()
+    sfx_signature = b'7z\xbc\xaf\x27\x1c'
+    mtime_tolerance = 2  # zip stores mtime in 2 seconds steps
+
+    @staticmethod
+    def check_7z_header(buf, offset: int) -> bool:
+        '''
+        checks the 32 bytes signature header at offset: major version 0, StartHeaderCRC matches and the next header lies inside buf
+        '''
+        header = buf[offset:offset+32]
+        if len(header) < 32 or header[6] != 0:
+            return False
+        start_crc, next_offset, next_size = struct.unpack("<IQQ", header[8:28])
+        if zlib.crc32(header[12:32]) != start_crc:
+            return False
+        return offset+32+next_offset+next_size <= len(buf)
 
     @staticmethod
-    def setLibarchive(lib_file: str) -> None:
-        os.environ.update({"LIBARCHIVE": lib_file})
+    def zip_mtime(info) -> float:
+        '''
+        mtime of a ZipInfo from its extended timestamp (UT, 0x5455) extra field like libarchive, else the local DOS time
+        '''
+        extra = info.extra
+        i = 0
+        while i+4 <= len(extra):
+            header_id, size = struct.unpack("<HH", extra[i:i+4])
+            data = extra[i+4:i+4+size]
+            if header_id == 0x5455 and len(data) >= 5 and data[0] & 1:
+                return struct.unpack("<i", data[1:5])[0]
+            i += 4+size
+        return time.mktime(info.date_time+(0, 0, -1))
+
+    @staticmethod
+    def find_7z_headers(buf) -> Generator:
+        '''
+        yields offsets of valid 7z signature headers in buf, searching with the native find() of bytes/mmap
+        '''
+        i = buf.find(Decompress.sfx_signature)
+        while i != -1:
+            if Decompress.check_7z_header(buf, i):
+                yield i
+            i = buf.find(Decompress.sfx_signature, i+1)
+
+    @classmethod
+    def setLibarchive(cls, lib_file: str) -> None:
+        '''
+        the library is loaded again on the next Decompress
+        '''
+        with cls.load_lock:
+            os.environ.update({"LIBARCHIVE": lib_file})
+            cls.libarchive_stale = True
 
     def __init__(self, filename: str, use_zipfile=False) -> None:
         self.f = None
         self.mm = None
+        self.zf = None
+        self.catalog = None
         self.filename = filename
+        self.use_zipfile = use_zipfile
+        self.backend = "libarchive"
         if use_zipfile or not self.load_libarchive():
-            logging.warning(
-                "using build-in ZipFile library on %s because libarchive is not available or user forcing" % filename)
+            if use_zipfile:
+                logging.debug("using build-in ZipFile library on %s" % filename)
+            else:
+                logging.warning(
+                    "using build-in ZipFile library on %s because libarchive is not available" % filename)
+            self.use_zipfile = True
+            self.backend = "zipfile"
             self.zf = ZipFile(self.filename)
-            self.getFileList = self.zf.namelist
-            self.extractAll = self.zf.extractall
-
-            def extractFiles(filenames: list, outdir: str):
-                for file in filenames:
-                    self.zf.extract(file, outdir)
-            self.extractFiles = extractFiles
-            self.__del__ = self.zf.close
         elif filename.endswith(".exe"):
             logging.info("input an exe file, try extracting 7z sfx")
             self.reader = self.libarchive.memory_reader
-            self.extracter = self.libarchive.extract_memory
-
-            self.f = open(filename, "r+b")
-            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
-            self.read_from=None
-            for i in range(len(self.mm)-8):
-                if self.mm[i:i+8] == b'\x37\x7a\xbc\xaf\x27\x1c\x00\x04':
-                    self.read_from = self.mm[i:]
-                    logging.debug("found 7z header at 0x%x" % i)
-                    break
+
+            self.f = open(filename, "rb")
+            # copy-on-write mapping, so ctypes can point into it without copying, nothing is ever written
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_COPY)
+            self.read_from = None
+            # the sfx stub may carry the signature bytes too, take the first candidate libarchive can read
+            for i in self.find_7z_headers(self.mm):
+                view = (ctypes.c_char*(len(self.mm)-i)).from_buffer(self.mm, i)
+                try:
+                    with self.reader(view) as archive:
+                        next(iter(archive), None)
+                except self.libarchive.ArchiveError:
+                    logging.debug("skipped unreadable 7z header at 0x%x" % i)
+                    continue
+                self.read_from = view
+                logging.debug("found 7z header at 0x%x" % i)
+                break
             if not self.read_from:
-                raise("%s is not a 7z sfx file" % filename)
-            
+                raise ValueError("%s is not a 7z sfx file" % filename)
+
         else:
             self.reader = self.libarchive.file_reader
-            self.extracter = self.libarchive.extract_file
-            self.read_from = filename
+            self.read_from = os.path.abspath(filename)
+            if is_zipfile(filename):
+                # central directory for listing and picking single files, libarchive still does full extractions
+                self.zf = ZipFile(filename)
 
     def __del__(self):
         if self.mm:
-            self.mm.close()
+            # drop the ctypes views into the mapping first, or it can't be closed
+            self.read_from = None
+            try:
+                self.mm.close()
+            except BufferError:
+                gc.collect()
+                self.mm.close()
+            self.mm = None
         if self.f:
             self.f.close()
+            self.f = None
+        if self.zf:
+            self.zf.close()
+            self.zf = None
 
-    def load_libarchive(self):
-        if self.libarchive:
-            reload(self.libarchive)
-            return True
-        else:
+    @classmethod
+    def load_libarchive(cls) -> bool:
+        '''
+        imports libarchive on first use, again only after setLibarchive(). a failed load isn't retried until then either
+        '''
+        if not cls.libarchive_stale and (cls.libarchive or cls.libarchive_error):
+            return cls.libarchive != None
+        with cls.load_lock:
+            if not cls.libarchive_stale and (cls.libarchive or cls.libarchive_error):
+                return cls.libarchive != None
+            start = time.perf_counter()
+            if cls.libarchive_stale:
+                # the ctypes bindings are made on import, the whole package has to go for another library
+                for name in list(sys.modules):
+                    if name == "libarchive" or name.startswith("libarchive."):
+                        del sys.modules[name]
+            cls.libarchive_stale = False
             try:
-                self.libarchive = import_module("libarchive")
-                return True
+                cls.libarchive = import_module("libarchive")
+                cls.libarchive_error = None
             except Exception as e:
                 logging.warning("Load libarchive failed, see error below")
                 logging.exception(e)
+                cls.libarchive = None
+                cls.libarchive_error = e
                 return False
+            finally:
+                cls.libarchive_load_time = time.perf_counter()-start
+            logging.debug("loaded libarchive %s from %s in %.3fs" % (
+                cls.libarchive.ffi.version_number(), cls.libarchive.ffi.libarchive_path, cls.libarchive_load_time))
+            return True
 
-    def getFileList(self) -> Generator:
-        with self.reader(self.read_from) as archive:
-            for entry in archive:
-                if type(entry.name) == bytes:
-                    logging.warning(
-                        "none-ASCII character in filename '%s', this file will not be decompressed" % entry.name.decode(errors="ignore"))
-                    continue
-                yield entry.name
+    @classmethod
+    def libarchiveInfo(cls) -> dict:
+        '''
+        which library is loaded and how long it took, path and version are None if it isn't
+        '''
+        cls.load_libarchive()
+        info = {"path": None, "version": None,
+                "load_time": cls.libarchive_load_time, "error": cls.libarchive_error}
+        if cls.libarchive:
+            info["path"] = cls.libarchive.ffi.libarchive_path
+            info["version"] = cls.libarchive.ffi.version_number()
+        return info
+
+    def getCatalog(self) -> dict:
+        '''
+        name -> {"size", "mtime", "isdir", "index", "offset", "crc"}, read once and cached. index is the position in the archive,
+        offset the local header offset and crc the crc32 for zip, both None for others
+        '''
+        if self.catalog != None:
+            return self.catalog
+        catalog = {}
+        if self.zf:
+            for index, info in enumerate(self.zf.infolist()):
+                catalog[info.filename] = {
+                    "size": info.file_size,
+                    "mtime": self.zip_mtime(info),
+                    "isdir": info.is_dir(),
+                    "index": index,
+                    "offset": info.header_offset,
+                    "crc": info.CRC
+                }
+        else:
+            with self.reader(self.read_from) as archive:
+                # only headers are read, data of the entries is skipped
+                for index, entry in enumerate(archive):
+                    if type(entry.name) == bytes:
+                        logging.warning(
+                            "none-ASCII character in filename '%s', this file will not be decompressed" % entry.name.decode(errors="ignore"))
+                        continue
+                    catalog[entry.name] = {
+                        "size": entry.size or 0,
+                        "mtime": entry.mtime,
+                        "isdir": entry.isdir,
+                        "index": index,
+                        "offset": None,
+                        "crc": None
+                    }
+        self.catalog = catalog
+        return catalog
+
+    def getFileList(self) -> list:
+        return list(self.getCatalog())
 
     def getPrefixDir(self) -> str:
-        self.filelist = list(self.getFileList())
+        self.filelist = self.getFileList()
         if len(self.filelist) == 1:
             dir = ""
         else:
@@ -88,31 +245,299 @@ class Decompress():
         return dir
 
     def extractFiles(self, filenames: list, outdir: str) -> None:
-        pwd_temp = os.getcwd()
-        if not os.path.exists(outdir):
-            os.makedirs(outdir)
-        os.chdir(outdir)
-        entries = self.__select_entries_with_names(filenames)
-        self.libarchive.extract.extract_entries(entries)
-        os.chdir(pwd_temp)
-
-    def __select_entries_with_names(self, filenames: list) -> Generator:
+        catalog = self.getCatalog()
+        wanted = set(filenames)
+        for name in wanted.difference(catalog):
+            logging.warning("'%s' not found in %s" % (name, self.filename))
+        wanted.intersection_update(catalog)
+        os.makedirs(outdir, exist_ok=True)
+        if self.use_zipfile:
+            # seeks to each member from the central directory
+            for name in wanted:
+                path = self.zf.extract(name, outdir)
+                if not catalog[name]["isdir"]:
+                    os.utime(path, (time.time(), catalog[name]["mtime"]))
+            return
+        self.__extract_entries(
+            self.__select_entries_with_names(wanted), outdir)
+
+    @staticmethod
+    def safe_path(outdir: str, name: str) -> str:
+        '''
+        absolute path of member name under outdir, which has to be a realpath.
+        ValueError if it would end up outside, like "../x", "/etc/x" or through an extracted symlink
+        '''
+        name = os.path.normpath(name)
+        if os.path.isabs(name) or name == os.pardir or name.startswith(os.pardir+os.sep):
+            raise ValueError("'%s' points outside of %s" % (name, outdir))
+        parent = os.path.realpath(os.path.join(outdir, os.path.dirname(name)))
+        if parent != outdir and not parent.startswith(os.path.join(outdir, "")):
+            raise ValueError("'%s' points outside of %s" % (name, outdir))
+        return os.path.join(parent, os.path.basename(name))
+
+    def __entries_under(self, entries, outdir: str) -> Generator:
+        for entry in entries:
+            try:
+                entry.pathname = os.fsencode(
+                    self.safe_path(outdir, os.fsdecode(entry.pathname)))
+                if entry.islnk:
+                    entry.linkpath = os.fsencode(
+                        self.safe_path(outdir, os.fsdecode(entry.linkpath)))
+            except ValueError as e:
+                logging.warning("skipped unsafe entry: %s" % e)
+                continue
+            yield entry
+
+    def __extract_entries(self, entries, outdir: str) -> None:
+        # every entry gets an absolute path, so nothing depends on the cwd and threads can extract at the same time
+        os.makedirs(outdir, exist_ok=True)
+        outdir = os.path.realpath(outdir)
+        extract = self.libarchive.extract
+        flags = extract.EXTRACT_TIME | extract.EXTRACT_SECURE_NODOTDOT | extract.EXTRACT_SECURE_SYMLINKS
+        extract.extract_entries(self.__entries_under(entries, outdir), flags)
+
+    def __select_entries_with_names(self, filenames: set) -> Generator:
+        # entries come in catalog order, stop reading after the last wanted one. libarchive reads a zip in local header
+        # order rather than the central directory order of the catalog, but skips the data of an entry with a seek
+        last = None if self.zf else max(
+            (self.catalog[name]["index"] for name in filenames), default=-1)
         with self.reader(self.read_from) as archive:
-            for entry in archive:
+            for index, entry in enumerate(archive):
+                if last != None and index > last:
+                    break
                 if entry.name in filenames:
                     logging.debug("selected file '%s'" % entry.name)
                     yield entry
 
-    def extractAll(self, outdir: str) -> None:
-        pwd_temp = os.getcwd()
-        if not os.path.exists(outdir):
-            os.makedirs(outdir)
-        os.chdir(outdir)
-        logging.debug("chdir to %s, starting extraction" % outdir)
-        self.extracter(self.read_from)
+    def iterEntries(self, names: list = None, pattern: str = None, chunk_size: int = 65536) -> Generator:
+        '''
+        yields (metadata, chunks) for files matching names and the glob pattern, nothing is written to disk.
+        metadata is a catalog item with "name" added, chunks a generator of bytes up to chunk_size.
+        chunks has to be read before asking for the next entry, the archive is read as one stream
+
+            for meta, chunks in Decompress(file).iterEntries(pattern="*.dll"):
+                h = hashlib.sha256()
+                for chunk in chunks:
+                    h.update(chunk)
+        '''
+        wanted = None if names == None else set(names)
+
+        def selected(name: str) -> bool:
+            return (wanted == None or name in wanted) and (pattern == None or fnmatch(name, pattern))
+        if self.zf:
+            for name, meta in self.getCatalog().items():
+                if not meta["isdir"] and selected(name):
+                    yield dict(meta, name=name), self.__zip_chunks(name, chunk_size)
+            return
+        last = None
+        if wanted != None:
+            catalog = self.getCatalog()
+            last = max((catalog[name]["index"]
+                       for name in wanted if name in catalog), default=-1)
+        with self.reader(self.read_from) as archive:
+            for index, entry in enumerate(archive):
+                if last != None and index > last:
+                    break
+                if type(entry.name) == bytes or entry.isdir or not selected(entry.name):
+                    continue
+                meta = {
+                    "name": entry.name,
+                    "size": entry.size or 0,
+                    "mtime": entry.mtime,
+                    "isdir": False,
+                    "index": index,
+                    "offset": None,
+                    "crc": None
+                }
+                yield meta, entry.get_blocks(chunk_size)
+
+    def __zip_chunks(self, name: str, chunk_size: int) -> Generator:
+        with self.zf.open(name) as f:
+            chunk = f.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = f.read(chunk_size)
+
+    def count_7z_blocks(self) -> int:
+        '''
+        number of solid blocks from "7z l -slt", 0 if 7z is not available
+        '''
+        try:
+            output = subprocess.run([Py7z.bin_path, "l", "-slt", self.filename],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+        except OSError as e:
+            logging.debug("cannot count 7z blocks: %s" % e)
+            return 0
+        for line in output.splitlines():
+            if line.startswith("Blocks = "):
+                return int(line[9:])
+        return 0
+
+    def parallel_safe(self) -> bool:
+        '''
+        whether workers can read their entries independently: zip members are compressed one by one,
+        7z only when there is more than one solid block, anything else is a single compressed stream
+        '''
+        if self.zf:
+            return True
+        with self.reader(self.read_from) as archive:
+            next(iter(archive), None)
+            format_name = archive.format_name
+        if format_name.startswith(b"ZIP"):
+            return True
+        elif format_name.startswith(b"7-Zip"):
+            return self.count_7z_blocks() > 1
+        return False
+
+    @staticmethod
+    def partition(entries: list, parts: int) -> list:
+        '''
+        splits (name, size) into at most parts contiguous lists of names with about the same total size,
+        contiguous so a worker on a 7z decompresses as few blocks as possible
+        '''
+        total = sum(max(size, 1) for _, size in entries)
+        chunks = []
+        chunk = []
+        used = 0
+        for name, size in entries:
+            chunk.append(name)
+            used += max(size, 1)
+            if len(chunks) < parts-1 and used >= total*(len(chunks)+1)/parts:
+                chunks.append(chunk)
+                chunk = []
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def file_crc(path: str, chunk_size: int = 1048576) -> int:
+        crc = 0
+        with open(path, "rb") as f:
+            chunk = f.read(chunk_size)
+            while chunk:
+                crc = zlib.crc32(chunk, crc)
+                chunk = f.read(chunk_size)
+        return crc
+
+    def changedEntries(self, outdir: str, check_crc: bool = False) -> list:
+        '''
+        names of entries missing in outdir or with another size or mtime, in archive order.
+        with check_crc files passing that are compared by crc32 too, from the central directory for zip,
+        other formats have to decompress those entries once for it
+        '''
+        outdir = os.path.realpath(outdir)
+        catalog = self.getCatalog()
+        changed = []
+        same = []
+        for name, entry in catalog.items():
+            try:
+                path = self.safe_path(outdir, name)
+            except ValueError:
+                continue
+            try:
+                st = os.lstat(path)
+            except OSError:
+                changed.append(name)
+                continue
+            if entry["isdir"] or stat.S_ISLNK(st.st_mode):
+                continue
+            if st.st_size != entry["size"] or abs(st.st_mtime-entry["mtime"]) > self.mtime_tolerance:
+                changed.append(name)
+            elif check_crc:
+                same.append(name)
+        if same:
+            if self.zf:
+                expected = {name: catalog[name]["crc"] for name in same}
+            else:
+                expected = {}
+                for meta, chunks in self.iterEntries(same):
+                    crc = 0
+                    for chunk in chunks:
+                        crc = zlib.crc32(chunk, crc)
+                    expected[meta["name"]] = crc
+            for name in same:
+                if self.file_crc(self.safe_path(outdir, name)) != expected.get(name):
+                    changed.append(name)
+            changed.sort(key=lambda name: catalog[name]["index"])
+        return changed
+
+    def deleteStale(self, outdir: str) -> list:
+        '''
+        removes files under outdir which are not in the archive, returns their paths
+        '''
+        outdir = os.path.realpath(outdir)
+        keep = set()
+        for name in self.getCatalog():
+            try:
+                keep.add(self.safe_path(outdir, name).rstrip(os.sep))
+            except ValueError:
+                pass
+        removed = []
+        for root, dirs, files in os.walk(outdir):
+            for file in files:
+                path = os.path.join(root, file)
+                if path not in keep:
+                    logging.debug("removing stale file %s" % path)
+                    os.remove(path)
+                    removed.append(path)
+        return removed
+
+    def extractParallel(self, outdir: str, workers: int, names: list = None) -> None:
+        catalog = self.getCatalog()
+        if names == None:
+            names = catalog
+        chunks = self.partition([(name, catalog[name]["size"]) for name in names],
+                                workers)
+        os.makedirs(outdir, exist_ok=True)
+        if len(chunks) == 0:
+            return
+        outdir = os.path.abspath(outdir)
+        logging.debug("extracting %s with %s workers" %
+                      (self.filename, len(chunks)))
+        with ProcessPoolExecutor(len(chunks)) as executor:
+            futures = [executor.submit(_extract_worker, self.filename, self.use_zipfile, chunk, outdir)
+                       for chunk in chunks]
+            for future in futures:
+                future.result()
         logging.debug("extraction complete")
-        os.chdir(pwd_temp)
 
+    def extractAll(self, outdir: str, workers: int = 1, incremental: bool = False, check_crc: bool = False, delete_stale: bool = False) -> None:
+        '''
+        workers > 1 extracts with that many processes, 0 for one per cpu. archives that can't be split,
+        like tar.gz or a solid 7z with one block, are extracted in this process anyway.
+        incremental only writes entries that changedEntries() reports, delete_stale removes files not in the archive afterwards
+        '''
+        if workers == 0:
+            workers = os.cpu_count()
+        names = None
+        if incremental:
+            names = self.changedEntries(outdir, check_crc)
+            logging.info("%s of %s entries in %s changed" %
+                         (len(names), len(self.getCatalog()), self.filename))
+        if names == None or len(names) > 0:
+            self.__extract_all(outdir, workers, names)
+        if delete_stale:
+            removed = self.deleteStale(outdir)
+            logging.info("removed %s stale files from %s" %
+                         (len(removed), outdir))
+
+    def __extract_all(self, outdir: str, workers: int, names: list = None) -> None:
+        if workers > 1:
+            if self.parallel_safe():
+                return self.extractParallel(outdir, workers, names)
+            logging.info(
+                "%s is a single compressed stream, extracting serially" % self.filename)
+        if names != None:
+            self.extractFiles(names, outdir)
+            return
+        if self.use_zipfile:
+            # member by member, so mtimes are set for incremental mode
+            self.extractFiles(self.getFileList(), outdir)
+            return
+        logging.debug("extracting %s to %s" % (self.filename, outdir))
+        with self.reader(self.read_from) as archive:
+            self.__extract_entries(archive, outdir)
+        logging.debug("extraction complete")
 
 if __name__ == "__main__":
     from _Log import my_log_settings
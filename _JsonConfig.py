@@ -1,32 +1,95 @@
-
 #!/bin/python3
+import os
+import sys
 import json
+import re
+import stat
+import time
+import marshal
+import atexit
+import select
+import ctypes
+import tempfile
+import threading
+from functools import lru_cache
 from collections import UserDict
+from collections.abc import Mapping, MutableMapping
 from copy import deepcopy
 import logging
 from typing import Iterable
+# faster parsers, used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 
 class JsonConfig(UserDict):
+    json_backends = {"orjson": orjson, "ujson": ujson, "json": json}
+    json_backend = "json"
+    # marshal sidecar next to the file, file+".cache", reused while mtime and size of the file are the same
+    parse_cache = False
+
+    @classmethod
+    def setJsonBackend(cls, backend: str) -> None:
+        '''
+        parser for loading configs, the stdlib json by default. orjson and ujson are faster, input they reject like NaN
+        or 1e400 is parsed by json again. orjson reads integers beyond 64 bits as floats, only pick it when there are none
+        '''
+        if backend not in cls.json_backends:
+            raise ValueError("Unsupported json backend %s" % backend)
+        if cls.json_backends[backend] == None:
+            raise ImportError("%s is not installed" % backend)
+        cls.json_backend = backend
+
+    @classmethod
+    def setParseCache(cls, enabled: bool) -> None:
+        cls.parse_cache = enabled
+
+    @classmethod
+    def loads(cls, raw: bytes):
+        if cls.json_backend != "json":
+            try:
+                return cls.json_backends[cls.json_backend].loads(raw)
+            except ValueError as e:
+                logging.debug("%s cannot parse it, retrying with json: %s" %
+                              (cls.json_backend, e))
+        return json.loads(raw)
+
     @staticmethod
-    def mergeDict(a: dict, b: dict):
-        newdict = deepcopy(a)
-        for key in b:
-            typeflag = type(b[key])
-            if typeflag == dict:
-                if key in a:
-                    newvalue = JsonConfig.mergeDict(a[key], b[key])
+    def mergeDict(a: dict, b: dict, share: bool = False) -> dict:
+        '''
+        b over a: dicts are merged, sets united, lists and tuples concatenated, anything else is taken from b.
+        values from b are shared with the result, values from a are copied once, or shared as well with share=True
+        '''
+        copy = deepcopy if not share else (lambda value: value)
+        newdict = {}
+        stack = [(newdict, a, b)]
+        while stack:
+            out, a, b = stack.pop()
+            for key in a:
+                if key not in b:
+                    out[key] = copy(a[key])
+                    continue
+                typeflag = type(b[key])
+                if typeflag == dict and type(a[key]) == dict:
+                    out[key] = {}
+                    stack.append((out[key], a[key], b[key]))
+                elif typeflag == set:
+                    newvalue = set(a[key])
+                    newvalue.update(b[key])
+                    out[key] = newvalue
+                elif typeflag == list or typeflag == tuple:
+                    out[key] = a[key]+b[key]
                 else:
-                    newvalue = b[key]
-            elif typeflag == set:
-                newvalue = deepcopy(a[key])
-                for bb in b[key]:
-                    newvalue.add(bb)
-            elif typeflag == list or typeflag == tuple:
-                newvalue = a[key]+b[key]
-            else:
-                newvalue = b[key]
-            newdict.update({key: newvalue})
+                    out[key] = b[key]
+            for key in b:
+                if key not in a:
+                    out[key] = b[key]
         return newdict
 
     @staticmethod
@@ -53,9 +116,70 @@ class JsonConfig(UserDict):
                 new.append(new_key)
             return typeflag(new)
 
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def variables_pattern(keys: tuple) -> re.Pattern:
+        # longest first, so "$HOME_DIR" is not taken as "$HOME" followed by "_DIR"
+        return re.compile("|".join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+
+    @staticmethod
+    def replaceMany(config, variables: dict):
+        '''
+        replace() for all variables in one walk. a string equal to a variable becomes its value, whatever type it is,
+        str values are also substituted inside strings. text that came from a substitution is not substituted again.
+        dicts are updated in place, lists and tuples are only rebuilt when something in them changed
+        '''
+        keys = tuple(key for key, value in variables.items()
+                     if key and type(value) == str)
+        pattern = JsonConfig.variables_pattern(keys) if keys else None
+        memo = {}  # configs repeat the same strings a lot
+
+        def substitute(match) -> str:
+            return variables[match.group(0)]
+
+        def walk(node):
+            typeflag = type(node)
+            if typeflag == str:
+                if node in variables:
+                    return variables[node]
+                if pattern == None:
+                    return node
+                newvalue = memo.get(node)
+                if newvalue == None:
+                    newvalue = memo[node] = pattern.sub(substitute, node)
+                # an equal string can be another object, unchanged ones have to be returned as they came
+                return node if newvalue == node else newvalue
+            elif typeflag == int or typeflag == float or typeflag == bool or node == None:
+                return node
+            elif typeflag == dict:
+                for key, value in node.items():
+                    newvalue = walk(value)
+                    if newvalue is not value:
+                        node[key] = newvalue
+                return node
+            else:
+                new = [walk(item) for item in node]
+                if all(newitem is item for newitem, item in zip(new, node)):
+                    return node
+                return typeflag(new)
+        return walk(config)
+
     def __init__(self, file: str, mode: str = "rw") -> None:
         self.file = file
         self.mode = mode
+        self.dump_lock = threading.RLock()
+        self.dumped_text = None
+        self.dumped_signature = None
+        self.dump_timer = None
+        self.dump_kwargs = {}
+        self.atexit_registered = False
+        self.loaded_signature = None
+        self.failed_signature = None
+        # set_defaults and var_replace calls, replayed on the new data by reload()
+        self.applied = []
+        self.watcher = None
+        self.watch_thread = None
+        self.watch_callbacks = []
         if mode == "w":  # write only
             self.data = {}
         elif mode == "r":  # read only, throw error when not exist
@@ -70,24 +194,512 @@ class JsonConfig(UserDict):
             raise ValueError("Unknown mode %s" % mode)
 
     def read_file(self):
-        with open(self.file, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
+        self.data = self.load_file()
+
+    def load_file(self):
+        with open(self.file, 'rb') as f:
+            # taken before reading, a change in between is caught on the next load
+            st = os.fstat(f.fileno())
+            signature = (st.st_mtime_ns, st.st_size, marshal.version)
+            data = self.read_cache(signature) if self.parse_cache else None
+            cached = data != None
+            if not cached:
+                data = self.loads(f.read())
+        self.loaded_signature = signature[:2]
+        if self.parse_cache and not cached and time.time()-st.st_mtime > 1:
+            # a file changed within the same mtime tick could keep its size, only cache settled files
+            self.write_cache(signature, data)
+        return data
 
-    def var_replace(self, key: str, value: str):
-        self.data = self.replace(self.data, key, value)
+    def read_cache(self, signature: tuple):
+        try:
+            with open(self.file+".cache", "rb") as f:
+                # marshal.load on the file object reads in tiny pieces, loads on the whole content is much faster
+                cached_signature, data = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if tuple(cached_signature) != signature:
+            return None
+        logging.debug("loaded %s from parse cache" % self.file)
+        return data
 
-    def set_defaults(self, defaults: dict):
-        self.data = self.mergeDict(defaults, self.data)
+    def write_cache(self, signature: tuple, data) -> None:
+        cache_file = self.file+".cache"
+        temp = None
+        try:
+            fd, temp = tempfile.mkstemp(prefix=os.path.basename(cache_file)+".", suffix=".tmp",
+                                        dir=os.path.dirname(os.path.abspath(cache_file)))
+            with os.fdopen(fd, "wb") as f:
+                f.write(marshal.dumps((signature, data)))
+            os.replace(temp, cache_file)
+        except (OSError, ValueError) as e:
+            logging.debug("cannot write parse cache of %s: %s" % (self.file, e))
+            if temp and os.path.exists(temp):
+                os.remove(temp)
+
+    @staticmethod
+    def with_variables(data, key, value):
+        if isinstance(data, LayeredDict):
+            data = data.materialize()
+        if type(key) == dict:
+            return JsonConfig.replaceMany(data, key)
+        return JsonConfig.replace(data, key, value)
 
-    def dumpconfig(self, config: dict = None, sort_keys: bool = False, indent: int = 4, separators: Iterable[str] = (',', ': '), ensure_ascii: bool = False, **kwargs):
+    @staticmethod
+    def with_defaults(data, defaults: dict, lazy: bool):
+        if lazy:
+            return LayeredDict(data, defaults)
+        return JsonConfig.mergeDict(defaults, data)
+
+    def var_replace(self, key: str, value: str = None):
+        '''
+        key can be a dict of variable -> value, to replace all of them in one pass with replaceMany()
+        '''
+        self.applied.append((self.with_variables, key, value))
+        self.data = self.with_variables(self.data, key, value)
+
+    def set_defaults(self, defaults: dict, lazy: bool = False):
+        '''
+        lazy puts defaults under the data as a LayeredDict instead of merging them now
+        '''
+        self.applied.append((self.with_defaults, defaults, lazy))
+        self.data = self.with_defaults(self.data, defaults, lazy)
+
+    @staticmethod
+    def diff(old, new) -> list:
+        '''
+        key paths, as tuples of keys, added, removed or changed from old to new. mappings are compared key by key,
+        anything else as a whole
+        '''
+        changed = []
+        stack = [((), old, new)]
+        while stack:
+            path, a, b = stack.pop()
+            if a is b:
+                continue
+            if isinstance(a, Mapping) and isinstance(b, Mapping):
+                for key in a:
+                    if key not in b:
+                        changed.append(path+(key,))
+                for key in b:
+                    if key not in a:
+                        changed.append(path+(key,))
+                    else:
+                        stack.append((path+(key,), a[key], b[key]))
+            elif type(a) != type(b) or a != b:
+                changed.append(path)
+        return changed
+
+    def reload(self) -> list:
+        '''
+        reads the file again if it changed on disk since it was read or dumped, set_defaults and var_replace
+        are applied again. returns the changed key paths, see diff()
+        '''
+        signature = self.file_signature()
+        if signature == None or signature in (self.loaded_signature, self.failed_signature):
+            return []
+        try:
+            data = self.load_file()
+        except ValueError as e:
+            # probably caught in the middle of a non atomic write, the next change will be tried again
+            logging.warning("cannot reload %s: %s" % (self.file, e))
+            self.failed_signature = signature
+            return []
+        except FileNotFoundError:
+            return []
+        for apply, *args in self.applied:
+            data = apply(data, *args)
+        changed = self.diff(self.data, data)
+        self.data = data
+        if changed:
+            logging.debug("%s reloaded, %s changed" % (self.file, changed))
+        return changed
+
+    def watch(self, callback=None, interval: float = 1) -> None:
+        '''
+        keeps reloading the file in a background thread, callback(config, paths) is called with the paths reload() returned.
+        inotify wakes it up on linux, otherwise the file is checked every interval
+        '''
+        if callback != None:
+            self.watch_callbacks.append(callback)
+        if self.watcher != None:
+            return
+        self.watcher = FileWatcher(self.file, interval)
+        self.watch_thread = threading.Thread(
+            target=self.watch_loop, args=(self.watcher,), name="JsonConfigWatcher", daemon=True)
+        self.watch_thread.start()
+
+    def unwatch(self) -> None:
+        if self.watcher == None:
+            return
+        self.watcher.close()
+        self.watch_thread.join()
+        self.watcher.release()
+        self.watcher = None
+        self.watch_thread = None
+
+    def watch_loop(self, watcher) -> None:
+        while watcher.wait():
+            try:
+                changed = self.reload()
+            except Exception as e:
+                logging.exception(e)
+                continue
+            if not changed:
+                continue
+            for callback in list(self.watch_callbacks):
+                try:
+                    callback(self, changed)
+                except Exception as e:
+                    logging.exception(e)
+
+    def file_signature(self) -> tuple:
+        try:
+            st = os.stat(self.file)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def copy_owner(st: os.stat_result, path: str) -> None:
+        if not hasattr(os, "chown"):
+            return
+        temp_st = os.stat(path)
+        if (temp_st.st_uid, temp_st.st_gid) == (st.st_uid, st.st_gid):
+            return
+        try:
+            os.chown(path, st.st_uid, st.st_gid)
+        except PermissionError:
+            # only root can give a file away, the group can still be any group we are in
+            try:
+                os.chown(path, -1, st.st_gid)
+            except PermissionError:
+                logging.warning("cannot keep owner %s:%s of %s" %
+                                (st.st_uid, st.st_gid, path))
+
+    @staticmethod
+    def create_temp(path: str, mode: int) -> tuple:
+        '''
+        creates a new file named after path in its directory, mode is limited by the umask like open() does
+        '''
+        for attempt in range(100):
+            temp = "%s.%s.tmp" % (path, os.urandom(4).hex())
+            try:
+                return os.open(temp, os.O_CREAT | os.O_EXCL | os.O_WRONLY, mode), temp
+            except FileExistsError:
+                continue
+        raise FileExistsError("no free temp file name for %s" % path)
+
+    def atomic_write(self, text: str) -> None:
+        '''
+        writes text to a temp file next to file, fsyncs it and renames it over file, so there is always a whole file.
+        a symlinked file is written through to its target, mode, owner and group are kept where allowed.
+        writes in place when no file can be created in the directory
+        '''
+        target = os.path.realpath(self.file)
+        dir = os.path.dirname(target)
+        try:
+            st = os.stat(target)
+        except FileNotFoundError:
+            st = None
+        try:
+            # an existing file is only readable by us until it gets the mode of the old one
+            fd, temp = self.create_temp(target, 0o666 if st == None else 0o600)
+        except PermissionError as e:
+            logging.warning("cannot write %s atomically, writing in place: %s" % (self.file, e))
+            with open(self.file, "w", encoding='utf-8') as f:
+                f.write(text)
+            return
+        try:
+            with os.fdopen(fd, "w", encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            if st != None:
+                self.copy_owner(st, temp)
+                os.chmod(temp, stat.S_IMODE(st.st_mode))
+            os.replace(temp, target)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        if hasattr(os, "O_DIRECTORY"):
+            # the rename itself is only durable once the directory is synced
+            dir_fd = os.open(dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def dumpconfig(self, config: dict = None, sort_keys: bool = False, indent: int = 4, separators: Iterable[str] = (',', ': '), ensure_ascii: bool = False, atomic: bool = True, skip_unchanged: bool = True, **kwargs) -> bool:
+        '''
+        atomic writes through atomic_write(). skip_unchanged doesn't write when the text is the same as the last dump
+        and nobody touched the file since. returns whether the file was written
+        '''
         if self.mode == "r":
             raise ValueError(
                 "Not allow to write when opened on read-only mode")
         if config == None:
             config = self.data
-        with open(self.file, "w", encoding='utf-8') as f:
-            json.dump(config, f, sort_keys=sort_keys, indent=indent,
-                      separators=separators, ensure_ascii=ensure_ascii, **kwargs)
+        own = config is self.data
+        if isinstance(config, LayeredDict):
+            config = config.materialize()
+        for attempt in range(3):
+            try:
+                text = json.dumps(config, sort_keys=sort_keys, indent=indent,
+                                 separators=separators, ensure_ascii=ensure_ascii, **kwargs)
+                break
+            except RuntimeError:
+                # changed by another thread while serializing
+                if attempt == 2:
+                    raise
+        with self.dump_lock:
+            if skip_unchanged and text == self.dumped_text and self.file_signature() == self.dumped_signature:
+                return False
+            if atomic:
+                self.atomic_write(text)
+            else:
+                with open(self.file, "w", encoding='utf-8') as f:
+                    f.write(text)
+            self.dumped_text = text
+            self.dumped_signature = self.file_signature()
+            if own:
+                # our own write, nothing for reload() to pick up
+                self.loaded_signature = self.dumped_signature
+        return True
+
+    def dump_later(self, delay: float = 1, **kwargs) -> None:
+        '''
+        dumpconfig(**kwargs) in a background thread after delay seconds, calls in between are coalesced into that one.
+        a pending dump is written at exit, or earlier with flush()
+        '''
+        with self.dump_lock:
+            self.dump_kwargs = kwargs
+            if self.dump_timer != None:
+                return
+            self.dump_timer = threading.Timer(delay, self.flush)
+            self.dump_timer.daemon = True
+            self.dump_timer.start()
+            if not self.atexit_registered:
+                atexit.register(self.flush)
+                self.atexit_registered = True
+
+    def flush(self) -> bool:
+        '''
+        writes a pending dump_later() now, returns False if there was none or nothing changed
+        '''
+        with self.dump_lock:
+            if self.dump_timer == None:
+                return False
+            self.dump_timer.cancel()
+            self.dump_timer = None
+            return self.dumpconfig(**self.dump_kwargs)
+
+class LayeredDict(MutableMapping):
+    '''
+    layers merged like JsonConfig.mergeDict, first layer on top, but only for the keys that are read:
+
+        config = LayeredDict(file_data, defaults)
+        config["download"]["dir"]
+
+    the lower layers are never changed, they are only read. writing a key replaces it like in a merged dict: the key is
+    taken out of copies of the lower layers, which are made once per layer. a list or set that isn't the top layer's alone
+    is moved into it when read, so it can be changed in place, and a nested dict is read through a LayeredDict of its own
+    '''
+
+    def __init__(self, *layers: dict, parent: tuple = None, attached: bool = True) -> None:
+        self.layers = list(layers)
+        # (LayeredDict, key) of a nested dict, whose layers are the values of key in the parent's layers
+        self.parent = parent
+        # False while the top layer is a new dict, put into the parent's top layer on the first write
+        self.attached = attached
+        self.copied = set()  # indices of lower layers already replaced by a copy
+
+    def merged(self, key):
+        values = [layer[key] for layer in self.layers if key in layer]
+        if len(values) == 0:
+            raise KeyError(key)
+        kinds = ((dict, LayeredDict), (set,), (list, tuple))
+        kind = next((kind for kind in kinds if isinstance(values[0], kind)), None)
+        if kind == None:
+            return values[0]
+        # a layer with another kind of value hides everything below it
+        merged = []
+        for value in values:
+            if not isinstance(value, kind):
+                break
+            merged.append(value)
+        if kind == kinds[0]:
+            if key not in self.layers[0]:
+                return LayeredDict({}, *merged, parent=(self, key), attached=False)
+            return merged[0] if len(merged) == 1 else LayeredDict(*merged, parent=(self, key))
+        if len(merged) == 1:
+            return merged[0]
+        if kind == kinds[1]:
+            return set().union(*merged)
+        newvalue = merged[-1]
+        for value in reversed(merged[:-1]):
+            newvalue = newvalue+value
+        return newvalue
+
+    def __getitem__(self, key):
+        value = self.merged(key)
+        if isinstance(value, (set, list)) and not (key in self.layers[0] and value is self.layers[0][key]):
+            self.own(key)
+            return self.layers[0][key]
+        return value
+
+    def own(self, key, keep: bool = True) -> None:
+        '''
+        takes key out of the lower layers, with keep its whole value is put into the top layer first
+        '''
+        if all(key not in layer for layer in self.layers[1:]):
+            self.attach()
+            return
+        if self.parent != None:
+            # the lower layers belong to the parent, it takes this whole dict into its top layer instead
+            parent, parent_key = self.parent
+            parent.own(parent_key)
+            value = parent.layers[0].get(parent_key)
+            self.layers = [value if isinstance(value, dict) else self.materialize()]
+            self.parent = None
+            self.attached = True
+            return
+        if keep:
+            value = self.merged(key)
+            self.layers[0][key] = value.materialize() if isinstance(
+                value, LayeredDict) else deepcopy(value)
+        for i in range(1, len(self.layers)):
+            if key in self.layers[i]:
+                if i not in self.copied:
+                    layer = self.layers[i]
+                    self.layers[i] = layer.materialize() if isinstance(
+                        layer, LayeredDict) else dict(layer)
+                    self.copied.add(i)
+                del self.layers[i][key]
+
+    def attach(self) -> None:
+        if self.attached:
+            return
+        parent, key = self.parent
+        parent.attach()
+        top = parent.layers[0].setdefault(key, self.layers[0])
+        if isinstance(top, dict):
+            # another read of the same key may have been written first
+            self.layers[0] = top
+        self.attached = True
+
+    def __setitem__(self, key, value) -> None:
+        self.own(key, keep=False)
+        self.layers[0][key] = value
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.own(key, keep=False)
+        self.layers[0].pop(key, None)
+
+    def __iter__(self):
+        seen = {}
+        for layer in reversed(self.layers):
+            for key in layer:
+                seen[key] = None
+        return iter(seen)
+
+    def __len__(self) -> int:
+        return len(set().union(*self.layers))
+
+    def __contains__(self, key) -> bool:
+        return any(key in layer for layer in self.layers)
+
+    def __repr__(self) -> str:
+        return "LayeredDict(%s)" % ", ".join(repr(layer) for layer in self.layers)
+
+    def materialize(self) -> dict:
+        '''
+        the merged plain dict, sharing nothing with the layers
+        '''
+        layers = [layer.materialize() if isinstance(layer, LayeredDict) else layer
+                  for layer in self.layers]
+        newdict = layers[-1]
+        for layer in reversed(layers[:-1]):
+            newdict = JsonConfig.mergeDict(newdict, layer, share=True)
+        return deepcopy(newdict)
+
+
+class FileWatcher():
+    '''
+    wait() returns when the file may have changed, or after interval seconds at the latest. inotify watches the directory,
+    as editors and atomic writes replace the file. without inotify it is plain polling
+    '''
+    # inotify event masks from sys/inotify.h
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self, file: str, interval: float = 1, use_inotify: bool = True) -> None:
+        self.interval = interval
+        self.closed = threading.Event()
+        self.fd = None
+        self.wake_r = self.wake_w = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self.fd = self.inotify_open(
+                    os.path.dirname(os.path.abspath(file)))
+                # select() on the pipe too, so close() doesn't wait for the interval
+                self.wake_r, self.wake_w = os.pipe()
+            except (OSError, AttributeError) as e:
+                logging.debug("inotify not available, polling %s: %s" % (file, e))
+
+    def inotify_open(self, dir: str) -> int:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | \
+            self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(dir), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, "inotify_add_watch failed on %s" % dir)
+        return fd
+
+    def wait(self) -> bool:
+        '''
+        False once closed
+        '''
+        if self.fd == None:
+            return not self.closed.wait(self.interval)
+        readable, _, _ = select.select(
+            [self.fd, self.wake_r], [], [], self.interval)
+        if self.closed.is_set():
+            return False
+        if self.fd in readable:
+            # events of other files in the directory come too, checking the file is cheap enough
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        return True
+
+    def close(self) -> None:
+        '''
+        stops wait(), call release() once nothing waits anymore
+        '''
+        self.closed.set()
+        if self.wake_w != None:
+            os.write(self.wake_w, b"x")
+
+    def release(self) -> None:
+        for fd in (self.fd, self.wake_r, self.wake_w):
+            if fd != None:
+                os.close(fd)
+        self.fd = self.wake_r = self.wake_w = None
 
 
 if __name__ == "__main__":
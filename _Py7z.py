@@ -1,50 +1,199 @@
 #!/bin/python3
 import subprocess
-import os,sys
+import os
+import re
+import shutil
+import tempfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Generator
 class Py7z: 
     bin_path="7z"
+    # resolved once per process and bin_path, instead of a probe process per archive
+    resolved_path = None
+    version = None
+    missing = False  # bin_path was not found, not looked up again until set7zBin()
+    # 7z x jobs of all instances share one pool
+    max_jobs = os.cpu_count() or 1
+    executor = None
+    lock = threading.Lock()
+
     @classmethod
     def set7zBin(cls,bin_path):
-        cls.bin_path=bin_path
-    def __init__(self, filename):
-        if subprocess.call(self.bin_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL):
-            print("PLease check if 7z is installed")
-            sys.exit(2)
+        with cls.lock:
+            cls.bin_path=bin_path
+            cls.resolved_path = None
+            cls.version = None
+            cls.missing = False
+
+    @classmethod
+    def setMaxJobs(cls, max_jobs: int) -> None:
+        with cls.lock:
+            cls.max_jobs = max_jobs
+            if cls.executor != None:
+                # running jobs finish in the old pool
+                cls.executor.shutdown(wait=False)
+                cls.executor = None
 
+    @classmethod
+    def check_bin(cls) -> str:
+        '''
+        resolves bin_path and reads the 7z version, once
+        '''
+        with cls.lock:
+            if cls.resolved_path == None:
+                path = None if cls.missing else shutil.which(cls.bin_path)
+                if path == None:
+                    if not cls.missing:
+                        logging.error("please check if 7z is installed")
+                        cls.missing = True
+                    raise FileNotFoundError("7z not found: %s" % cls.bin_path)
+                banner = subprocess.run([path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        universal_newlines=True).stdout
+                match = re.search(r"7-Zip.*?(\d+\.\d+)", banner)
+                cls.version = match.group(1) if match else None
+                cls.resolved_path = path
+                logging.debug("using 7z %s at %s" % (cls.version, path))
+            return cls.resolved_path
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        with cls.lock:
+            if cls.executor == None:
+                cls.executor = ThreadPoolExecutor(cls.max_jobs, thread_name_prefix="Py7z")
+            return cls.executor
+
+    def __init__(self, filename):
+        self.check_bin()
+        # listed on first use
         self.filename = filename
 
-        self.getFileList()
+    @staticmethod
+    def slt_entry(block: dict) -> dict:
+        # the archive itself is listed with the same keys, it is the block with "Physical Size"
+        if "Path" not in block or "Physical Size" in block:
+            return None
+        attributes = block.get("Attributes", "")
+        return {
+            "path": block["Path"],
+            "size": int(block.get("Size") or 0),
+            "packed_size": int(block.get("Packed Size") or 0),
+            "crc": int(block["CRC"], 16) if block.get("CRC") else None,
+            "attributes": attributes,
+            "isdir": block.get("Folder") == "+" or attributes.startswith("D"),
+            "modified": block.get("Modified"),
+            "block": int(block["Block"]) if block.get("Block") else None
+        }
+
+    @staticmethod
+    def parse_slt(lines) -> Generator:
+        '''
+        turns "7z l -slt" output into entry dicts as they come, entries are "key = value" lines separated by a blank line
+        '''
+        block = {}
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if line == "" or line.startswith("----------"):
+                entry = Py7z.slt_entry(block)
+                if entry:
+                    yield entry
+                block = {}
+                continue
+            key, sep, value = line.partition(" = ")
+            if sep:
+                block[key] = value
+        entry = Py7z.slt_entry(block)
+        if entry:
+            yield entry
+
+    def iterEntries(self) -> Generator:
+        '''
+        yields entries of the archive while 7z is still listing, path, size, packed_size, crc, attributes, isdir, modified and block
+        '''
+        p = subprocess.Popen([self.check_bin(), "l", "-slt", "-ba", "-sccUTF-8", self.filename], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, encoding="utf-8", errors="surrogateescape")
+        try:
+            yield from self.parse_slt(p.stdout)
+        except GeneratorExit:
+            # the caller stopped early, 7z failing on the closed pipe says nothing about the archive
+            p.kill()
+            raise
+        finally:
+            p.stdout.close()
+            returncode = p.wait()
+        if returncode != 0:
+            raise FileBrokenError(self.filename)
+
+    def getIndex(self) -> dict:
+        '''
+        path -> entry of iterEntries(), listed once and cached
+        '''
+        try:
+            return self.index
+        except AttributeError:
+            index = {}
+            for entry in self.iterEntries():
+                index[entry["path"]] = entry
+            self.index = index
+            return self.index
 
     def getFileList(self):
         try:
             return self.filelist
         except AttributeError:
-            self.filelist = []
-            p=subprocess.Popen([self.bin_path, "l", self.filename], stdout=subprocess.PIPE, bufsize=1, universal_newlines=True)
-            for line in p.stdout:
-                line = line.split()
-                if "....." in line or "....A" in line:
-                    filename = line[-1]
-                    self.filelist.append(filename)
-            p.wait()
-            if p.returncode!=0:
-                raise FileBrokenError(self.filename)
+            self.filelist = list(self.getIndex())
             return self.filelist
 
     def getPrefixDir(self):
-        if len(self.filelist)==1:
+        filelist = self.getFileList()
+        if len(filelist)==1:
             dir=""
         else:
-            dir = os.path.commonpath(self.filelist)
+            dir = os.path.commonpath(filelist)
         return dir
 
     def extractFiles(self, filenames, outdir):
-        cmd = [self.bin_path, "x", "-y", "-o"+outdir, self.filename]+filenames
-        subprocess.call(cmd)
+        index = self.getIndex()
+        names = [name for name in filenames if name in index]
+        for name in set(filenames).difference(index):
+            logging.warning("'%s' not found in %s" % (name, self.filename))
+        if len(names) == 0:
+            return None
+        # names go through a list file, there can be more than a command line takes. -spd so they are no wildcards
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".txt", delete=False) as listfile:
+            listfile.write("\n".join(names))
+        try:
+            return self.run(["x", "-y", "-spd", "-scsUTF-8", "-o"+outdir, self.filename, "@"+listfile.name])
+        finally:
+            os.remove(listfile.name)
+
+    def extractAll(self, outdir, switches=None):
+        '''
+        switches are extra 7z switches like ["-mmt=4"]
+        '''
+        return self.run(["x", "-y", "-o"+outdir]+(switches or [])+[self.filename])
+
+    def run(self, args: list) -> subprocess.CompletedProcess:
+        '''
+        runs 7z with args, exit code 1 is a warning, anything above raises ExtractError with what 7z printed to stderr
+        '''
+        p = subprocess.run([self.check_bin()]+args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                           universal_newlines=True, errors="replace")
+        if p.returncode == 1:
+            logging.warning("7z warning on %s: %s" % (self.filename, p.stderr.strip()))
+        elif p.returncode != 0:
+            raise ExtractError(self.filename, p.returncode, p.stderr.strip())
+        return p
+
+    def extractFilesAsync(self, filenames, outdir) -> Future:
+        '''
+        extractFiles in the shared pool, at most max_jobs 7z processes run at once. the future raises ExtractError on failure
+        '''
+        return self.get_executor().submit(self.extractFiles, filenames, outdir)
 
-    def extractAll(self, outdir):
-        cmd = [self.bin_path, "x", "-y", "-o"+outdir, self.filename]
-        subprocess.call(cmd)
+    def extractAllAsync(self, outdir, switches=None) -> Future:
+        return self.get_executor().submit(self.extractAll, outdir, switches)
 
 
 class FileBrokenError(Exception):
@@ -55,5 +204,16 @@ class FileBrokenError(Exception):
     def __str__(self):
         return repr(self.message)
 
+
+class ExtractError(Exception):
+    def __init__(self, filename, returncode, stderr):
+        Exception.__init__(self)
+        self.returncode = returncode
+        self.stderr = stderr
+        self.message = "7z failed on %s with exit code %s: %s" % (filename, returncode, stderr)
+
+    def __str__(self):
+        return repr(self.message)
+
 if __name__ == "__main__":
 	pass
@@ -1,9 +1,13 @@
 from ._JsonConfig import *
 from ._Aria2Rpc import *
+from ._AsyncAria2Rpc import *
+from ._Aria2Pool import *
+from ._Aria2Progress import *
 from ._ProcessCtrl import *
 from ._Py7z import *
 from ._Url import *
 from ._Log import *
 from ._Decompress import *
+from ._Archive import *
 from ._DoNothing import *
 from ._InstanceLock import *
@@ -0,0 +1,80 @@
+#!/bin/python3
+# Runs extractAll with every available backend on generated zip and 7z archives of growing size,
+# next to the backend the current Archive.policy would pick. Use it to calibrate the policy thresholds.
+# usage: python benchmarks/bench_archive_backends.py [max_mb] [file_kb]
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+import libarchive
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Archive import Archive
+from _Py7z import Py7z
+
+
+def make_tree(src: str, total_mb: int, file_kb: int) -> None:
+    rnd = random.Random(total_mb)
+    words = [bytes(rnd.choices(range(97, 123), k=8)) for _ in range(4096)]
+    for i in range(max(total_mb*1024//file_kb, 1)):
+        path = os.path.join(src, "pkg", "%03d" % (i % 32), "%05d.bin" % i)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b" ".join(rnd.choices(words, k=file_kb*1024//9)))
+
+
+def make_archives(tmp: str, src: str, total_mb: int) -> dict:
+    archives = {}
+    path = os.path.join(tmp, "%smb.zip" % total_mb)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for root, _, files in os.walk(src):
+            for file in files:
+                zf.write(os.path.join(root, file),
+                         os.path.relpath(os.path.join(root, file), src))
+    archives["zip"] = path
+    path = os.path.join(tmp, "%smb.7z" % total_mb)
+    if Archive.is_available("7z"):
+        # lzma2 with several blocks, what 7z itself writes for releases
+        subprocess.run([Py7z.resolved_path, "a", "-mx=5", "-mmt=on", path, "pkg"], cwd=src,
+                       stdout=subprocess.DEVNULL, check=True)
+    else:
+        cwd = os.getcwd()
+        os.chdir(src)
+        with libarchive.file_writer(path, "7zip") as w:
+            w.add_files("pkg")
+        os.chdir(cwd)
+    archives["7z"] = path
+    return archives
+
+
+def main(max_mb: int = 64, file_kb: int = 256) -> None:
+    backends = [b for b in Archive.backends if Archive.is_available(b)]
+    print("available backends: %s" % ", ".join(backends))
+    print("%-6s %8s %-10s %-12s %s" %
+          ("format", "size", "policy", "backend", "seconds"))
+    total_mb = 1
+    while total_mb <= max_mb:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "src")
+            make_tree(src, total_mb, file_kb)
+            for format, path in make_archives(tmp, src, total_mb).items():
+                size = os.path.getsize(path)
+                chosen = Archive.choose(format, size)
+                for backend in backends:
+                    if backend == "zipfile" and format != "zip":
+                        continue
+                    out = os.path.join(tmp, "out")
+                    start = time.perf_counter()
+                    Archive(path, backend=backend).extractAll(out)
+                    used = time.perf_counter()-start
+                    shutil.rmtree(out)
+                    print("%-6s %7.1fM %-10s %-12s %.3f" %
+                          (format, size/1048576, chosen, backend, used))
+        total_mb *= 4
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
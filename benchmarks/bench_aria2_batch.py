@@ -0,0 +1,48 @@
+#!/bin/python3
+# Compares polling N tasks with one tellStatus per task against one batched request per tick.
+# usage: python benchmarks/bench_aria2_batch.py [tasks] [ticks]
+import sys
+import time
+from fake_aria2 import FakeAria2Server
+from _Aria2Rpc import Aria2Rpc
+
+
+def poll_one_by_one(tasks: list) -> list:
+    return [task.tellStatus() for task in tasks]
+
+
+def poll_batched(rpc: Aria2Rpc, tasks: list) -> list:
+    with rpc.batch() as b:
+        for task in tasks:
+            b.tellStatus(task.gid)
+    return b.results
+
+
+def main(task_num: int = 300, ticks: int = 5) -> None:
+    with FakeAria2Server(secret="abc", duration=3600) as server:
+        for api in ("xmlrpc", "jsonrpc"):
+            rpc = Aria2Rpc(port=server.port, passwd="abc", api=api)
+            tasks = [rpc.download("http://127.0.0.1/file%s" % i)
+                     for i in range(task_num)]
+
+            calls = server.requests
+            start = time.perf_counter()
+            for _ in range(ticks):
+                single = poll_one_by_one(tasks)
+            single_time = (time.perf_counter()-start)/ticks
+            single_calls = (server.requests-calls)//ticks
+
+            calls = server.requests
+            start = time.perf_counter()
+            for _ in range(ticks):
+                batched = poll_batched(rpc, tasks)
+            batch_time = (time.perf_counter()-start)/ticks
+            batch_calls = (server.requests-calls)//ticks
+
+            assert [r["gid"] for r in single] == [r["gid"] for r in batched]
+            print("%-8s %s tasks: one by one %.1fms/tick (%s requests), batched %.1fms/tick (%s requests), %.1fx" % (
+                api, task_num, single_time*1000, single_calls, batch_time*1000, batch_calls, single_time/batch_time))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,57 @@
+#!/bin/python3
+# Python overhead per rpc call on a stubbed transport: the old closure per attribute access with eager
+# argument formatting, against the methods generated from system.listMethods.
+# usage: python benchmarks/bench_aria2_dispatch.py [calls]
+import logging
+import sys
+import timeit
+from fake_aria2 import FakeAria2Server
+from _Aria2Rpc import Aria2Rpc, Aria2Task
+
+
+def old_rpc_getattr(rpc: Aria2Rpc, name: str):
+    # Aria2Rpc.__getattr__ before the generated method table
+    def __defaultMethod(*args):
+        newargs = rpc._add_secret(args)
+        logging.debug("calling rpc method: %s, args: %s" %
+                      (name, str(newargs)))
+        jsonrsp = rpc._post_json({
+            'jsonrpc': '2.0',
+            'id': 'Aria2Rpc',
+            'method': 'aria2.'+name,
+            'params': newargs
+        })
+        return jsonrsp["result"]
+    return __defaultMethod
+
+
+def old_task_getattr(task: Aria2Task, name: str):
+    # Aria2Task.__getattr__ before, one more getattr hop on the rpc
+    def __defaultMethod(*args):
+        newargs = (task.gid,) + args
+        method = old_rpc_getattr(task.rpc, name)
+        return method(*newargs)
+    return __defaultMethod
+
+
+def main(calls: int = 200000) -> None:
+    with FakeAria2Server(secret="abc") as server:
+        rpc = Aria2Rpc(port=server.port, passwd="abc", api="jsonrpc")
+        task = rpc.download("http://127.0.0.1/file")
+    # stub the transport, only python overhead is left
+    result = {"result": {"status": "active"}}
+    rpc._post_json = lambda jsonreq: result
+    cases = {
+        "rpc old": lambda: old_rpc_getattr(rpc, "tellStatus")(task.gid),
+        "rpc new": lambda: rpc.tellStatus(task.gid),
+        "task old": lambda: old_task_getattr(task, "tellStatus")(),
+        "task new": lambda: task.tellStatus(),
+    }
+    logging.root.setLevel(logging.INFO)
+    for name, case in cases.items():
+        used = timeit.timeit(case, number=calls)
+        print("%-9s %.3fus/call" % (name, used/calls*1e6))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
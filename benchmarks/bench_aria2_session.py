@@ -0,0 +1,45 @@
+#!/bin/python3
+# Latency and cpu time per jsonrpc call, module level requests.post (a new connection per call)
+# against the pooled keep-alive session, single threaded and from a thread pool.
+# usage: python benchmarks/bench_aria2_session.py [calls] [threads]
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from fake_aria2 import FakeAria2Server
+from _Aria2Rpc import Aria2Rpc
+
+
+class UnpooledAria2Rpc(Aria2Rpc):
+    # the transport as it was before the pooled session
+    def _post_json(self, jsonreq):
+        return requests.post(url=self.connection_url, json=jsonreq).json()
+
+
+def measure(rpc: Aria2Rpc, calls: int, threads: int) -> tuple:
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    if threads == 1:
+        for _ in range(calls):
+            rpc.getVersion()
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda _: rpc.getVersion(), range(calls)))
+    wall = time.perf_counter()-wall
+    cpu = time.process_time()-cpu
+    return wall/calls*1e6, cpu/calls*1e6
+
+
+def main(calls: int = 2000, threads: int = 8) -> None:
+    with FakeAria2Server(secret="abc") as server:
+        for thread_num in (1, threads):
+            for cls in (UnpooledAria2Rpc, Aria2Rpc):
+                rpc = cls(port=server.port, passwd="abc", api="jsonrpc")
+                requests_before = server.requests
+                latency, cpu = measure(rpc, calls, thread_num)
+                print("%-16s threads=%-2s %7.1fus/call wall, %7.1fus/call cpu (client+server), %s requests" % (
+                    cls.__name__, thread_num, latency, cpu, server.requests-requests_before))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
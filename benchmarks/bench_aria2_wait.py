@@ -0,0 +1,36 @@
+#!/bin/python3
+# How long Aria2Task.wait() and wget() take past the end of a download, with polling or notifications and with or
+# without the status cache. A waiter woken by a notification must not read a status cached before the event.
+# usage: python benchmarks/bench_aria2_wait.py [duration]
+import sys
+import time
+from fake_aria2 import FakeAria2Server
+from _Aria2Rpc import Aria2Rpc
+
+
+def main(duration: float = 0.5) -> None:
+    with FakeAria2Server(duration=duration) as server:
+        for notification in (False, True):
+            for status_ttl in (0, 2):
+                rpc = Aria2Rpc(port=server.port, api="jsonrpc", notification=notification,
+                               notification_fallback=10, status_ttl=status_ttl)
+                if rpc.notifier:
+                    rpc.notifier.connected.wait(5)
+                task = rpc.download("http://127.0.0.1/file")
+                start = time.perf_counter()
+                task.wait(interval=0.1)
+                wait_time = time.perf_counter()-start
+                start = time.perf_counter()
+                rpc.wget("http://127.0.0.1/file", progress_bar=False)
+                wget_time = time.perf_counter()-start
+                print("notification=%-5s status_ttl=%s: wait %.2fs, wget %.2fs" % (
+                    notification, status_ttl, wait_time, wget_time))
+                # polling may read a status up to status_ttl old, a notification must never wait for the fallback
+                limit = duration+1 if notification else duration+status_ttl+1
+                assert wait_time < limit and wget_time < limit
+                if rpc.notifier:
+                    rpc.notifier.close()
+
+
+if __name__ == "__main__":
+    main(*map(float, sys.argv[1:]))
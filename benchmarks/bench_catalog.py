@@ -0,0 +1,80 @@
+#!/bin/python3
+# Repeated listing and picking a few files out of a big archive: every call walking the archive again
+# against the cached catalog. the zip is listed from its central directory, picked files still go through libarchive.
+# usage: python benchmarks/bench_catalog.py [files] [file_kb] [picks]
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import libarchive
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+def old_list(filename: str) -> list:
+    # Decompress.getFileList before the catalog
+    with libarchive.file_reader(filename) as archive:
+        return [entry.name for entry in archive]
+
+
+def old_extract(filename: str, filenames: list, outdir: str) -> None:
+    # Decompress.extractFiles before the catalog: list lookup, reads to the end
+    def select():
+        with libarchive.file_reader(filename) as archive:
+            for entry in archive:
+                if entry.name in filenames:
+                    yield entry
+    os.makedirs(outdir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(outdir)
+    libarchive.extract.extract_entries(select())
+    os.chdir(cwd)
+
+
+def make_archives(tmp: str, files: int, file_kb: int) -> dict:
+    names = ["data/%05d.bin" % i for i in range(files)]
+    zip_path = os.path.join(tmp, "big.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in names:
+            zf.writestr(name, os.urandom(file_kb*1024))
+    seven_path = os.path.join(tmp, "big.7z")
+    src = os.path.join(tmp, "src")
+    with zipfile.ZipFile(zip_path) as zf:
+        zf.extractall(src)
+    cwd = os.getcwd()
+    os.chdir(src)
+    with libarchive.file_writer(seven_path, "7zip") as w:
+        w.add_files("data")
+    os.chdir(cwd)
+    return {"zip": zip_path, "7z": seven_path}
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter()-start
+
+
+def main(files: int = 5000, file_kb: int = 16, picks: int = 5) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        archives = make_archives(tmp, files, file_kb)
+        out = os.path.join(tmp, "out")
+        for kind, archive in archives.items():
+            # the first files in archive order, the 7z writer doesn't keep the order they were added
+            wanted = old_list(archive)[:picks]
+            old = timed(lambda: [old_list(archive) for _ in range(3)])
+            d = Decompress(archive)
+            new = timed(lambda: [d.getFileList() for _ in range(3)])
+            print("%-3s list x3     old %7.3fs  new %7.3fs" % (kind, old, new))
+            old = timed(old_extract, archive, wanted, out)
+            shutil.rmtree(out)
+            new = timed(d.extractFiles, wanted, out)
+            shutil.rmtree(out)
+            print("%-3s extract %-3s old %7.3fs  new %7.3fs" %
+                  (kind, picks, old, new))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
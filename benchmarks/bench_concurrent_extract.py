@@ -0,0 +1,53 @@
+#!/bin/python3
+# Extracting several archives one after another against a thread pool in one process, which the
+# chdir based extraction couldn't do. Checks every file came out right and the cwd was left alone.
+# usage: python benchmarks/bench_concurrent_extract.py [archives] [files] [file_kb] [threads]
+import filecmp
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+def make_archives(tmp: str, archives: int, files: int, file_kb: int) -> list:
+    src = os.path.join(tmp, "src")
+    os.makedirs(os.path.join(src, "pkg"))
+    for i in range(files):
+        with open(os.path.join(src, "pkg", "%04d.bin" % i), "wb") as f:
+            f.write(os.urandom(file_kb*512)+bytes(file_kb*512))
+    paths = []
+    for i in range(archives):
+        path = os.path.join(tmp, "bundle%02d.tar.gz" % i)
+        with tarfile.open(path, "w:gz") as tf:
+            tf.add(os.path.join(src, "pkg"), "pkg")
+        paths.append(path)
+    return src, paths
+
+
+def main(archives: int = 8, files: int = 64, file_kb: int = 256, threads: int = 4) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        src, paths = make_archives(tmp, archives, files, file_kb)
+        out = os.path.join(tmp, "out")
+        cwd = os.getcwd()
+        for thread_num in (1, threads):
+            def extract(path: str) -> None:
+                Decompress(path).extractAll(
+                    os.path.join(out, os.path.basename(path)))
+            start = time.perf_counter()
+            with ThreadPoolExecutor(thread_num) as pool:
+                list(pool.map(extract, paths))
+            used = time.perf_counter()-start
+            ok = all(not filecmp.dircmp(os.path.join(src, "pkg"), os.path.join(out, os.path.basename(path), "pkg")).diff_files
+                     for path in paths)
+            print("threads=%-2s %7.3fs, %s archives, content ok: %s, cwd unchanged: %s" %
+                  (thread_num, used, archives, ok, os.getcwd() == cwd))
+            shutil.rmtree(out)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
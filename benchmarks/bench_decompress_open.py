@@ -0,0 +1,41 @@
+#!/bin/python3
+# Cost of Decompress() plus a listing on many small archives: the per instance loader as before (an import
+# lookup per construction, reload() when an instance loads again) against the module loaded once per process.
+# usage: python benchmarks/bench_decompress_open.py [archives]
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from importlib import reload, import_module
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+class ReloadingDecompress(Decompress):
+    # Decompress.load_libarchive before the process wide loader, on the instance
+    def load_libarchive(self):
+        if self.__dict__.get("libarchive"):
+            reload(self.libarchive)
+        else:
+            self.libarchive = import_module("libarchive")
+        return True
+
+
+def main(archives: int = 1000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "small.zip")
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("a.txt", "a")
+        for cls in (ReloadingDecompress, Decompress):
+            start = time.perf_counter()
+            for _ in range(archives):
+                d = cls(path)
+                d.getFileList()
+            used = time.perf_counter()-start
+            print("%-20s %8.1fus/archive" % (cls.__name__, used/archives*1e6))
+    print(Decompress.libarchiveInfo())
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
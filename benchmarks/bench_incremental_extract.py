@@ -0,0 +1,34 @@
+#!/bin/python3
+# Re-extracting an archive into a directory that already holds it: full rewrite against incremental,
+# with and without crc checks, after touching a few files.
+# usage: python benchmarks/bench_incremental_extract.py [files] [file_kb] [touched]
+import os
+import sys
+import tempfile
+import time
+import zipfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+def main(files: int = 2000, file_kb: int = 64, touched: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "bundle.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(files):
+                zf.writestr("bundle/%05d.bin" % i, os.urandom(file_kb*512)+bytes(file_kb*512))
+        out = os.path.join(tmp, "out")
+        cases = (("full", {}), ("incremental", {"incremental": True}),
+                 ("incremental+crc", {"incremental": True, "check_crc": True}))
+        Decompress(archive).extractAll(out)
+        for name, kwargs in cases:
+            for i in range(touched):
+                with open(os.path.join(out, "bundle/%05d.bin" % (i*files//touched)), "ab") as f:
+                    f.write(b"changed")
+            start = time.perf_counter()
+            Decompress(archive).extractAll(out, **kwargs)
+            print("%-16s %7.3fs" % (name, time.perf_counter()-start))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
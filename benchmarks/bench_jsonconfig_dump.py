@@ -0,0 +1,51 @@
+#!/bin/python3
+# A service updating its state file many times a second: dumpconfig after every update as before (truncate and
+# rewrite in place), atomic dumps skipping unchanged content, and dump_later coalescing the burst.
+# usage: python benchmarks/bench_jsonconfig_dump.py [updates] [keys]
+import os
+import sys
+import tempfile
+import time
+import json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _JsonConfig import JsonConfig
+
+
+def old_dumpconfig(config: JsonConfig) -> None:
+    # JsonConfig.dumpconfig before
+    with open(config.file, "w", encoding='utf-8') as f:
+        json.dump(config.data, f, indent=4, separators=(',', ': '), ensure_ascii=False)
+
+
+def main(updates: int = 200, keys: int = 5000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        config = JsonConfig(path, "w")
+        config.data = {"key%s" % i: {"value": i, "name": "item%s" % i} for i in range(keys)}
+        old_dumpconfig(config)
+        print("file size %.1fMB, %s updates" % (os.path.getsize(path)/1048576, updates))
+
+        def burst(dump) -> float:
+            start = time.perf_counter()
+            for i in range(updates):
+                # half of the updates change nothing
+                config["counter"] = i//2
+                dump()
+            return time.perf_counter()-start
+        print("old dumpconfig       %7.3fs" % burst(lambda: old_dumpconfig(config)))
+        writes = [0]
+
+        def atomic():
+            writes[0] += config.dumpconfig()
+        used = burst(atomic)
+        print("atomic, skip same    %7.3fs, %s writes" % (used, writes[0]))
+        used = burst(lambda: config.dump_later(delay=0.2))
+        start = time.perf_counter()
+        config.flush()
+        print("dump_later           %7.3fs, flushed in %.3fs" %
+              (used, time.perf_counter()-start))
+        assert json.load(open(path))["counter"] == (updates-1)//2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,50 @@
+#!/bin/python3
+# Loading the same unchanged config again and again, like a cli tool starting: json.load in text mode as before,
+# every installed JsonConfig backend, and the marshal parse cache.
+# usage: python benchmarks/bench_jsonconfig_load.py [keys] [loads]
+import json
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _JsonConfig import JsonConfig
+
+
+def main(keys: int = 50000, loads: int = 20) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "config.json")
+        data = {"section%s" % (i % 100): {} for i in range(keys)}
+        for i in range(keys):
+            data["section%s" % (i % 100)]["key%s" % i] = {
+                "path": "/opt/app/%s" % i, "size": i, "enabled": i % 2 == 0, "tags": ["a", "b"]}
+        with open(path, "w", encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+        # old enough for the cache to be written
+        os.utime(path, (time.time()-10, time.time()-10))
+        print("file size %.1fMB" % (os.path.getsize(path)/1048576))
+
+        start = time.perf_counter()
+        for _ in range(loads):
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+        print("json.load text mode %8.2fms/load" % ((time.perf_counter()-start)/loads*1e3))
+        for backend, module in JsonConfig.json_backends.items():
+            if module == None:
+                continue
+            JsonConfig.setJsonBackend(backend)
+            start = time.perf_counter()
+            for _ in range(loads):
+                JsonConfig(path, "r")
+            print("%-19s %8.2fms/load" % (backend, (time.perf_counter()-start)/loads*1e3))
+        JsonConfig.setParseCache(True)
+        JsonConfig(path, "r")
+        start = time.perf_counter()
+        for _ in range(loads):
+            config = JsonConfig(path, "r")
+        print("parse cache         %8.2fms/load" % ((time.perf_counter()-start)/loads*1e3))
+        assert config.data == data
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,73 @@
+#!/bin/python3
+# JsonConfig.set_defaults on deep and wide synthetic configs: the recursive mergeDict with a deepcopy per level
+# as before, the single pass merge, and the lazy LayeredDict reading a few keys.
+# usage: python benchmarks/bench_jsonconfig_merge.py [depth] [width]
+import os
+import sys
+import time
+from copy import deepcopy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _JsonConfig import JsonConfig, LayeredDict
+
+
+def old_mergeDict(a: dict, b: dict):
+    # JsonConfig.mergeDict before, b values missing in a are taken as they are to not hit its KeyError
+    newdict = deepcopy(a)
+    for key in b:
+        typeflag = type(b[key])
+        if key not in a:
+            newvalue = b[key]
+        elif typeflag == dict:
+            newvalue = old_mergeDict(a[key], b[key])
+        elif typeflag == set:
+            newvalue = deepcopy(a[key])
+            for bb in b[key]:
+                newvalue.add(bb)
+        elif typeflag == list or typeflag == tuple:
+            newvalue = a[key]+b[key]
+        else:
+            newvalue = b[key]
+        newdict.update({key: newvalue})
+    return newdict
+
+
+def make_config(depth: int, width: int, salt: str) -> dict:
+    if depth == 0:
+        return {"value%s" % i: "%s%s" % (salt, i) for i in range(width)}
+    node = {"node%s" % i: make_config(depth-1, width, salt) for i in range(width)}
+    node["list"] = [salt]*4
+    node["set"] = {salt, depth}
+    node["leaf"] = salt
+    return node
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter()-start
+
+
+def main(depth: int = 6, width: int = 5) -> None:
+    shapes = {"deep": (depth, 3), "wide": (2, width*12)}
+    for shape, (d, w) in shapes.items():
+        defaults = make_config(d, w, "default")
+        data = make_config(d, w, "file")
+        # the file overrides part of the tree only
+        for key in list(data)[::2]:
+            del data[key]
+        assert old_mergeDict(defaults, data) == JsonConfig.mergeDict(defaults, data) \
+            == LayeredDict(data, defaults).materialize()
+        print("%s (depth %s, width %s)" % (shape, d, w))
+        print("  old mergeDict     %8.3fs" % timed(lambda: old_mergeDict(defaults, data)))
+        print("  mergeDict         %8.3fs" % timed(lambda: JsonConfig.mergeDict(defaults, data)))
+        print("  mergeDict share   %8.3fs" % timed(lambda: JsonConfig.mergeDict(defaults, data, share=True)))
+
+        def lazy():
+            config = LayeredDict(data, defaults)
+            for key in list(config)[:3]:
+                config[key]
+        print("  LayeredDict 3 keys%8.3fs" % timed(lazy))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,48 @@
+#!/bin/python3
+# Substituting many variables in a synthetic config: one JsonConfig.replace walk per variable as before,
+# against one replaceMany walk for all of them.
+# usage: python benchmarks/bench_jsonconfig_replace.py [variables] [nodes]
+import os
+import random
+import sys
+import time
+from copy import deepcopy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _JsonConfig import JsonConfig
+
+
+def make_config(variables: list, nodes: int) -> dict:
+    rnd = random.Random(0)
+    config = {}
+    for i in range(nodes):
+        section = config.setdefault("section%s" % (i % 50), {})
+        kind = i % 4
+        if kind == 0:
+            section["path%s" % i] = "%s/bin/tool%s" % (rnd.choice(variables), i % 20)
+        elif kind == 1:
+            section["args%s" % i] = ["--flag", "%s" % rnd.choice(variables), i]
+        elif kind == 2:
+            section["plain%s" % i] = "nothing to replace %s" % (i % 20)
+        else:
+            section["num%s" % i] = i
+    return config
+
+
+def main(variables: int = 40, nodes: int = 50000) -> None:
+    names = ["${VAR%s}" % i for i in range(variables)]
+    values = {name: "/opt/value%s" % i for i, name in enumerate(names)}
+    config = make_config(names, nodes)
+    old = deepcopy(config)
+    start = time.perf_counter()
+    for name, value in values.items():
+        old = JsonConfig.replace(old, name, value)
+    print("replace x%-3s   %7.3fs" % (variables, time.perf_counter()-start))
+    new = deepcopy(config)
+    start = time.perf_counter()
+    new = JsonConfig.replaceMany(new, values)
+    print("replaceMany    %7.3fs" % (time.perf_counter()-start))
+    print("same result: %s" % (old == new))
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+#!/bin/python3
+# Wall time of Decompress.extractAll on a zip with many members, one libarchive stream against worker processes.
+# A tar.gz of the same files shows the serial fallback for single stream archives.
+# usage: python benchmarks/bench_parallel_extract.py [files] [file_kb] [workers]
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import tarfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+def make_files(tmp: str, files: int, file_kb: int) -> list:
+    rnd = random.Random(0)
+    words = [bytes(rnd.choices(range(97, 123), k=8)) for _ in range(4096)]
+    names = []
+    for i in range(files):
+        name = "bundle/part%03d/file%05d.bin" % (i % 16, i)
+        path = os.path.join(tmp, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            # compressible but not trivially, like binaries and assets
+            f.write(b" ".join(rnd.choices(words, k=file_kb*1024//9)))
+        names.append(name)
+    return names
+
+
+def main(files: int = 256, file_kb: int = 1024, workers: int = 4) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        names = make_files(src, files, file_kb)
+        archives = {"zip": os.path.join(tmp, "bundle.zip"),
+                    "tar.gz": os.path.join(tmp, "bundle.tar.gz")}
+        with zipfile.ZipFile(archives["zip"], "w", zipfile.ZIP_DEFLATED) as zf:
+            for name in names:
+                zf.write(os.path.join(src, name), name)
+        with tarfile.open(archives["tar.gz"], "w:gz") as tf:
+            tf.add(os.path.join(src, "bundle"), "bundle")
+        for kind, archive in archives.items():
+            for worker_num in (1, workers):
+                out = os.path.join(tmp, "out")
+                start = time.perf_counter()
+                Decompress(archive).extractAll(out, workers=worker_num)
+                used = time.perf_counter()-start
+                extracted = sum(len(f) for _, _, f in os.walk(out))
+                print("%-6s workers=%-2s %7.3fs, %s files" %
+                      (kind, worker_num, used, extracted))
+                shutil.rmtree(out)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
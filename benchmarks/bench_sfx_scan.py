@@ -0,0 +1,69 @@
+#!/bin/python3
+# Time to locate the 7z archive inside a synthetic sfx exe: the old per offset slice compare against the
+# mmap.find based scan. The stub is random bytes with decoy signatures, the archive a small 7z by libarchive.
+# usage: python benchmarks/bench_sfx_scan.py [stub_mb] [decoys]
+import mmap
+import os
+import random
+import sys
+import tempfile
+import time
+import libarchive
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _Decompress import Decompress
+
+
+def old_scan(mm: mmap.mmap) -> int:
+    # Decompress.__init__ before the scan, with the signature bytes libarchive writes
+    for i in range(len(mm)-8):
+        if mm[i:i+8] == b'7z\xbc\xaf\x27\x1c\x00\x03':
+            return i
+    return -1
+
+
+def make_sfx(path: str, stub_mb: int, decoys: int) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        payload = os.path.join(tmp, "payload.bin")
+        with open(payload, "wb") as f:
+            f.write(os.urandom(65536))
+        archive = os.path.join(tmp, "payload.7z")
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        with libarchive.file_writer(archive, "7zip") as w:
+            w.add_files("payload.bin")
+        os.chdir(cwd)
+        stub = bytearray(random.Random(0).randbytes(stub_mb*1048576))
+        for _ in range(decoys):
+            i = random.randrange(len(stub)-32)
+            stub[i:i+8] = Decompress.sfx_signature+b'\x00\x04'
+        with open(path, "wb") as f, open(archive, "rb") as a:
+            f.write(stub)
+            f.write(a.read())
+        return len(stub)
+
+
+def main(stub_mb: int = 16, decoys: int = 8) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "setup.exe")
+        offset = make_sfx(path, stub_mb, decoys)
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            start = time.perf_counter()
+            found = old_scan(mm)
+            print("old scan   %8.3fs, offset %s" %
+                  (time.perf_counter()-start, found))
+            start = time.perf_counter()
+            found = next(Decompress.find_7z_headers(mm), -1)
+            print("find scan  %8.3fs, offset %s" %
+                  (time.perf_counter()-start, found))
+            mm.close()
+        start = time.perf_counter()
+        d = Decompress(path)
+        names = list(d.getFileList())
+        print("Decompress %8.3fs, files %s, expected offset %s" %
+              (time.perf_counter()-start, names, offset))
+        del d
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,268 @@
+#!/bin/python3
+# A tiny in-process stand-in for aria2's rpc interface, used by the benchmarks in this directory.
+# It speaks both xmlrpc (/rpc) and jsonrpc (/jsonrpc) over keep-alive HTTP/1.1, and simulates
+# downloads that complete after a fixed time, so no network or aria2c binary is needed.
+import base64
+import hashlib
+import heapq
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import xmlrpc.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeAria2State():
+    def __init__(self, secret: str = None, duration: float = 0.5, total_length: int = 1048576) -> None:
+        self.secret = secret
+        self.duration = duration
+        self.total_length = total_length
+        self.tasks = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.gids = count(1)
+        # completion timers and websocket clients for notifications
+        self.timers = []
+        self.timer_cond = threading.Condition()
+        self.listeners = []
+        threading.Thread(target=self.timer_loop, daemon=True).start()
+
+    def timer_loop(self) -> None:
+        while True:
+            with self.timer_cond:
+                while not self.timers or self.timers[0][0] > time.time():
+                    self.timer_cond.wait(
+                        self.timers[0][0]-time.time() if self.timers else None)
+                _, gid = heapq.heappop(self.timers)
+            with self.lock:
+                if gid not in self.tasks or self.status(gid)["status"] != "complete":
+                    continue
+            self.notify("aria2.onDownloadComplete", gid)
+
+    def notify(self, method: str, gid: str) -> None:
+        msg = json.dumps({"jsonrpc": "2.0", "method": method,
+                         "params": [{"gid": gid}]}).encode()
+        if len(msg) < 126:
+            frame = struct.pack("!BB", 0x81, len(msg))+msg
+        else:
+            frame = struct.pack("!BBH", 0x81, 126, len(msg))+msg
+        for listener in list(self.listeners):
+            try:
+                listener.sendall(frame)
+            except OSError:
+                self.listeners.remove(listener)
+
+    def status(self, gid: str) -> dict:
+        task = self.tasks[gid]
+        # urls with "/fail" in them end up in error, to exercise retries
+        if task["status"] != "error" and any("/fail" in u for u in task["uris"]):
+            task["status"] = "error"
+        if task["status"] in ("active", "waiting"):
+            used = time.time()-task["start"]
+            if used >= self.duration:
+                task["status"] = "complete"
+            else:
+                task["status"] = "active"
+        done = self.total_length if task["status"] == "complete" else int(
+            self.total_length*(time.time()-task["start"])/self.duration)
+        return {
+            "gid": gid,
+            "status": task["status"],
+            "totalLength": str(self.total_length),
+            "completedLength": str(done),
+            "downloadSpeed": str(int(self.total_length/self.duration)),
+            "errorCode": "1" if task["status"] == "error" else "0",
+            "errorMessage": "simulated failure" if task["status"] == "error" else "",
+            "files": [{"index": "1", "path": "", "uris": [{"uri": u, "status": "used"} for u in task["uris"]]}],
+        }
+
+    @staticmethod
+    def select(status: dict, keys: list = None) -> dict:
+        if not keys:
+            return status
+        return {k: status[k] for k in keys if k in status}
+
+    def call(self, method: str, params: list):
+        with self.lock:
+            self.calls += 1
+            if method.startswith("system."):
+                return self.system_call(method, params)
+            params = list(params)
+            if self.secret is not None:
+                if not params or params.pop(0) != "token:%s" % self.secret:
+                    raise PermissionError("Unauthorized")
+            name = method[len("aria2."):]
+            func = getattr(self, "m_"+name, None)
+            if func is None:
+                raise LookupError("No such method: %s" % method)
+            return func(*params)
+
+    def system_call(self, method: str, params: list):
+        if method == "system.listMethods":
+            return ["aria2."+name[2:] for name in dir(self) if name.startswith("m_")]
+        elif method == "system.listNotifications":
+            return ["aria2.onDownloadStart", "aria2.onDownloadPause", "aria2.onDownloadStop",
+                    "aria2.onDownloadComplete", "aria2.onDownloadError", "aria2.onBtDownloadComplete"]
+        raise LookupError("No such method: %s" % method)
+
+    def m_getSessionInfo(self):
+        return {"sessionId": "fakesession%x" % id(self)}
+
+    def m_getVersion(self):
+        return {"version": "1.36.0", "enabledFeatures": []}
+
+    def m_addUri(self, uris: list, options: dict = None, *_):
+        gid = options.get("gid") if options else None
+        if not gid:
+            gid = "%016x" % next(self.gids)
+        self.tasks[gid] = {"uris": list(uris), "start": time.time(), "status": "waiting"}
+        with self.timer_cond:
+            heapq.heappush(self.timers, (time.time()+self.duration, gid))
+            self.timer_cond.notify()
+        return gid
+
+    def m_tellStatus(self, gid: str, keys: list = None):
+        if gid not in self.tasks:
+            raise LookupError("GID %s is not found" % gid)
+        return self.select(self.status(gid), keys)
+
+    def m_tellActive(self, keys: list = None):
+        return [self.select(self.status(gid), keys) for gid in list(self.tasks) if self.status(gid)["status"] == "active"]
+
+    @staticmethod
+    def page(gids: list, offset: int, num: int) -> list:
+        # a negative offset counts from the end, in reversed order
+        if offset < 0:
+            gids = gids[::-1]
+            offset = -offset-1
+        return gids[offset:offset+num]
+
+    def m_tellWaiting(self, offset: int, num: int, keys: list = None):
+        gids = [gid for gid in list(self.tasks) if self.tasks[gid]["status"] in ("waiting", "paused")]
+        return [self.select(self.status(gid), keys) for gid in self.page(gids, offset, num)]
+
+    def m_tellStopped(self, offset: int, num: int, keys: list = None):
+        gids = [gid for gid in list(self.tasks) if self.status(gid)["status"]
+                in ("complete", "error", "removed")]
+        return [self.select(self.status(gid), keys) for gid in self.page(gids, offset, num)]
+
+    def m_getGlobalStat(self):
+        stat = {"numActive": 0, "numWaiting": 0, "numStopped": 0}
+        for gid in list(self.tasks):
+            status = self.status(gid)["status"]
+            if status == "active":
+                stat["numActive"] += 1
+            elif status in ("waiting", "paused"):
+                stat["numWaiting"] += 1
+            else:
+                stat["numStopped"] += 1
+        stat["downloadSpeed"] = str(stat["numActive"]*int(self.total_length/self.duration))
+        stat["uploadSpeed"] = "0"
+        return {k: str(v) for k, v in stat.items()}
+
+    def m_getOption(self, gid: str):
+        return {}
+
+    def m_removeDownloadResult(self, gid: str):
+        self.tasks.pop(gid, None)
+        return "OK"
+
+    def m_shutdown(self):
+        return "OK"
+
+
+class FakeAria2Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *_):
+        pass
+
+    def do_GET(self):
+        # websocket upgrade on /jsonrpc, only server to client notifications are supported
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.path != "/jsonrpc" or key == None:
+            self.send_error(404)
+            return
+        accept = base64.b64encode(hashlib.sha1(
+            (key+"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.server.state.listeners.append(self.connection)
+        try:
+            while self.connection.recv(1024):
+                pass
+        except OSError:
+            pass
+        self.close_connection = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests += 1
+        if self.path == "/jsonrpc":
+            rsp = self.handle_json(json.loads(body))
+            data = json.dumps(rsp).encode()
+            ctype = "application/json-rpc"
+        else:
+            data = self.handle_xml(body)
+            ctype = "text/xml"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_json(self, req):
+        if type(req) == list:
+            return [self.handle_json(r) for r in req]
+        try:
+            result = self.server.state.call(req["method"], req.get("params", []))
+            return {"jsonrpc": "2.0", "id": req["id"], "result": result}
+        except Exception as e:
+            return {"jsonrpc": "2.0", "id": req["id"], "error": {"code": 1, "message": str(e)}}
+
+    def handle_xml(self, body: bytes) -> bytes:
+        params, method = xmlrpc.client.loads(body)
+        try:
+            if method == "system.multicall":
+                result = []
+                for call in params[0]:
+                    try:
+                        result.append([self.server.state.call(call["methodName"], call["params"])])
+                    except Exception as e:
+                        result.append({"faultCode": 1, "faultString": str(e)})
+            else:
+                result = self.server.state.call(method, params)
+            return xmlrpc.client.dumps((result,), methodresponse=True, allow_none=True).encode()
+        except Exception as e:
+            return xmlrpc.client.dumps(xmlrpc.client.Fault(1, str(e)), methodresponse=True).encode()
+
+
+class FakeAria2Server(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self, port: int = 0, **kwargs) -> None:
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", port), FakeAria2Handler)
+        self.state = FakeAria2State(**kwargs)
+        self.requests = 0
+        self.port = self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.server_close()